@@ -0,0 +1,68 @@
+# Compares opening N packs with N single /open commands against one /open count:N,
+# driving the real command handler for many players at once, and reports packs
+# opened per second and Mongo commands per pack.
+#
+#   python bench_batched_open.py --users 200 --packs 5
+#
+# Needs a MongoDB server (--mongo-uri, default localhost). The database named by
+# --db is dropped and reseeded on every run.
+import argparse
+import asyncio
+import random
+import time
+from fake_catalog import import_main, start_main
+from fakes import FakeContext, FakeUser
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--users", type=int, default=200)
+parser.add_argument("--packs", type=int, default=5, help="packs each player opens")
+parser.add_argument("--cards", type=int, default=5000)
+parser.add_argument("--sets", type=int, default=40)
+parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+parser.add_argument("--db", default="pokemon_tcg_bench")
+parser.add_argument("--seed", type=int, default=1)
+args = parser.parse_args()
+
+main = import_main(args.mongo_uri, args.db)
+import metrics
+
+async def open_packs(user, batched):
+    await main.begin.callback(FakeContext(user, main.bot))
+    await main.repo.update_user(str(user.id), {"$set": {"packs_left": args.packs}})
+
+    if batched:
+        await main.open.callback(FakeContext(user, main.bot), count=args.packs, booster="default")
+    else:
+        for _ in range(args.packs):
+            await main.open.callback(FakeContext(user, main.bot), count=1, booster="default")
+
+async def measure(first_user, batched):
+    metrics.interaction_mongo_calls.series.clear()
+    users = [FakeUser(first_user + i) for i in range(args.users)]
+
+    started = time.perf_counter()
+    await asyncio.gather(*[open_packs(user, batched) for user in users])
+    elapsed = time.perf_counter() - started
+
+    opened = sum(doc.get('packs_opened', 0) for doc in main.db['users'].find({"user_id": {"$in": [str(user.id) for user in users]}}))
+    assert opened == args.users * args.packs, f"expected {args.users * args.packs} packs, opened {opened}"
+    counts, mongo_calls = metrics.interaction_mongo_calls.snapshot()["command_open"]
+    return opened / elapsed, sum(counts), mongo_calls / opened
+
+async def run():
+    await start_main(main, random.Random(args.seed), args.cards, args.sets)
+    # Back to back opens would otherwise be turned away by the per-user rate limit.
+    main.interaction_limiter.rate = main.interaction_limiter.burst = 1e9
+
+    single = await measure(100000, batched=False)
+    batched = await measure(200000, batched=True)
+
+    print(f"{args.users} players opening {args.packs} packs each")
+    print(f"{'open':<18}{'packs/s':>10}{'commands':>10}{'mongo/pack':>12}")
+    for name, (packs_per_s, commands, mongo_per_pack) in [(f"{args.packs} x count:1", single), (f"1 x count:{args.packs}", batched)]:
+        print(f"{name:<18}{packs_per_s:>10.1f}{commands:>10}{mongo_per_pack:>12.2f}")
+    print(f"Batched opens: {batched[0] / single[0]:.1f}x the packs per second")
+
+    main.db.client.drop_database(args.db)
+
+asyncio.run(run())
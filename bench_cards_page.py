@@ -0,0 +1,104 @@
+# Times a /cards page for a player owning thousands of distinct cards: the old
+# render, which scanned the whole catalog for every owned card, against render_page,
+# which reads one sorted page of owned_cards and looks cards up in the catalog.
+#
+#   python bench_cards_page.py --cards 20000 --owned 5000
+#
+# Runs on mongomock unless --mongo-uri is given; mongomock sorts in Python, so the
+# page numbers it gives are an upper bound. The database named by --db is dropped.
+import argparse
+import asyncio
+import random
+import time
+from catalog import Card, build_catalog
+from cards_pagination import cards_per_page, page_embeds, render_page
+from database import Repository
+from fake_catalog import card_docs, set_docs
+from fakes import FakeUser
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--cards", type=int, default=20000)
+parser.add_argument("--sets", type=int, default=100)
+parser.add_argument("--owned", type=int, default=5000)
+parser.add_argument("--repeat", type=int, default=20, help="renders to time for each page path")
+parser.add_argument("--mongo-uri")
+parser.add_argument("--db", default="pokemon_tcg_bench")
+parser.add_argument("--seed", type=int, default=1)
+args = parser.parse_args()
+
+def scan_cards_list(all_cards, all_sets, collected_cards):
+    # The old /cards: a linear scan of the catalog for each owned card.
+    cards_list = []
+    for card_set, cards in collected_cards.items():
+        set_name = next((s['name'] for s in all_sets if s['id'] == card_set), card_set)
+        for card_id, count in cards.items():
+            card = next((c for c in all_cards if c['id'] == card_id), None)
+            if card:
+                cards_list.append((card['name'], card_id, set_name, card['rarity'], count, card['image']))
+    cards_list.sort(key=lambda x: x[0])
+    return cards_list
+
+def connect_db():
+    if args.mongo_uri:
+        from database import connect
+        return connect(args.mongo_uri)[args.db]
+    import mongomock
+    return mongomock.MongoClient(tz_aware=True)[args.db]
+
+async def time_renders(render):
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        await render()
+    return (time.perf_counter() - started) / args.repeat * 1000
+
+async def run():
+    rng = random.Random(args.seed)
+    docs = card_docs(rng, args.cards, args.sets)
+    sets = set_docs(args.sets)
+    catalog, _ = build_catalog([Card.from_doc(doc) for doc in docs], sets)
+    owned = rng.sample(catalog.cards, args.owned)
+    user = FakeUser(1)
+
+    collected_cards = {}
+    for card in owned:
+        collected_cards.setdefault(card.set, {})[card.id] = rng.randint(1, 5)
+
+    started = time.perf_counter()
+    cards_list = scan_cards_list(docs, sets, collected_cards)
+    scan_ms = (time.perf_counter() - started) * 1000
+    assert len(cards_list) == args.owned
+
+    db = connect_db()
+    db.client.drop_database(args.db)
+    repo = Repository(db)
+    await repo.ensure_indexes()
+    await repo.create_user({"user_id": "1", "collection_version": 1})
+    db['owned_cards'].insert_many([
+        dict(catalog.get_owned_fields(card), user_id="1", card_id=card.id, count=collected_cards[card.set][card.id])
+        for card in owned
+    ])
+
+    async def render(page, sort="name"):
+        return await render_page(user, catalog, repo, "1", page, sort, "https://cdn.example/bot.png")
+
+    async def uncached(page, sort="name"):
+        page_embeds.clear()
+        return await render(page, sort)
+
+    last_page = args.owned // cards_per_page
+    results = [("scan, page 1", scan_ms)]
+    for sort in ("name", "rarity", "count"):
+        results.append((f"indexed {sort}, page 1", await time_renders(lambda: uncached(0, sort))))
+    results.append((f"indexed name, page {last_page + 1}", await time_renders(lambda: uncached(last_page))))
+    await render(0)
+    results.append(("cached page", await time_renders(lambda: render(0))))
+
+    print(f"{args.owned} owned of {args.cards} cards on {'mongod' if args.mongo_uri else 'mongomock'}")
+    print(f"{'render':<26}{'ms':>10}")
+    for name, ms in results:
+        print(f"{name:<26}{ms:>10.2f}")
+
+    db.client.drop_database(args.db)
+    repo.executor.shutdown()
+
+asyncio.run(run())
@@ -0,0 +1,53 @@
+# Measures how long the catalog takes to build at startup and how much memory it
+# holds, without a database: the card documents are generated in memory. The
+# __slots__ records with handle arrays are compared against keeping the pymongo
+# documents and grouping them in lists of dicts, as the catalog used to.
+#
+#   python bench_catalog.py --cards 50000 --sets 200
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from bson import ObjectId
+from catalog import Card, build_catalog
+from fake_catalog import card_docs, set_docs
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--cards", type=int, default=50000)
+parser.add_argument("--sets", type=int, default=200)
+parser.add_argument("--seed", type=int, default=1)
+args = parser.parse_args()
+
+def measure(label, build):
+    # The documents are traced too, since the old layout keeps them alive.
+    tracemalloc.start()
+    # Shaped like the documents pymongo hands the catalog
+    now = datetime.now(timezone.utc)
+    docs = [dict(doc, _id=ObjectId(), updated_at=now) for doc in card_docs(random.Random(args.seed), args.cards, args.sets)]
+    sets = set_docs(args.sets)
+    started = time.perf_counter()
+    kept = build(docs, sets)
+    elapsed = time.perf_counter() - started
+    del docs
+    memory, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<14}{elapsed * 1000:>10.1f}{memory / 1048576:>12.1f}{peak / 1048576:>12.1f}")
+    return kept
+
+def build_records(docs, sets):
+    cards = [Card.from_doc(doc) for doc in docs]
+    return build_catalog(cards, sets)
+
+def build_dicts(docs, sets):
+    cards_by_rarity = {}
+    cards_by_set = {}
+    for card in docs:
+        cards_by_rarity.setdefault(card.get('rarity'), []).append(card)
+        cards_by_set.setdefault(card.get('set'), []).append(card)
+    return docs, {card['id']: card for card in docs}, cards_by_rarity, cards_by_set
+
+print(f"{args.cards} cards in {args.sets} sets")
+print(f"{'build':<14}{'ms':>10}{'kept MiB':>12}{'peak MiB':>12}")
+measure("list of dicts", build_dicts)
+measure("records", build_records)
@@ -0,0 +1,73 @@
+# Times the embed work done on each button click: a reveal card built from scratch
+# against one built from the cached static part, and a /cards page built field by
+# field against one restored from the page cache.
+#
+#   python bench_embeds.py --iterations 20000
+import argparse
+import asyncio
+import random
+import time
+import discord
+from cards_pagination import CardsView, cards_per_page, update_embed
+from fake_catalog import make_catalog
+from fakes import FakeUser
+from pack_reveal import RevealView, card_embeds, create_card_embed
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--iterations", type=int, default=20000)
+parser.add_argument("--cards", type=int, default=20000)
+parser.add_argument("--sets", type=int, default=100)
+parser.add_argument("--seed", type=int, default=1)
+args = parser.parse_args()
+
+def per_click_us(click):
+    started = time.perf_counter()
+    for i in range(args.iterations):
+        click(i)
+    return (time.perf_counter() - started) / args.iterations * 1e6
+
+async def run():
+    rng = random.Random(args.seed)
+    catalog, card_pool = make_catalog(rng, args.cards, args.sets)
+    user = FakeUser(1)
+    pack = card_pool.draw_packs(1, rng=rng)[0]
+
+    def reveal(i, cached):
+        if not cached:
+            card_embeds.clear()
+        create_card_embed(catalog, card_pool, pack[i % len(pack)], "default", i % len(pack), len(pack), 1 + i % 2, user, ":pika:")
+
+    page_cards = [
+        dict(catalog.get_owned_fields(card), card_id=card.id, count=rng.randint(1, 5))
+        for card in rng.sample(catalog.cards, cards_per_page)
+    ]
+    built = await update_embed(user, catalog, page_cards, 0, 10, "https://cdn.example/bot.png")
+    cached_page = built.to_dict()
+
+    def build_page(i):
+        # update_embed is a coroutine only by signature; drive it without a loop hop.
+        coroutine = update_embed(user, catalog, page_cards, i % 10, 10, "https://cdn.example/bot.png")
+        try:
+            coroutine.send(None)
+        except StopIteration:
+            pass
+
+    def restore_page(i):
+        discord.Embed.from_dict(cached_page)
+
+    results = [
+        ("reveal, uncached", per_click_us(lambda i: reveal(i, False))),
+        ("reveal, cached", per_click_us(lambda i: reveal(i, True))),
+        ("cards page, built", per_click_us(build_page)),
+        ("cards page, cached", per_click_us(restore_page)),
+        # Built on every click either way, for scale
+        ("reveal view", per_click_us(lambda i: RevealView("pack", i % len(pack), len(pack)))),
+        ("cards view", per_click_us(lambda i: CardsView("1", i % 10, 10)))
+    ]
+
+    print(f"{args.iterations} clicks each")
+    print(f"{'click':<22}{'us':>10}")
+    for name, us in results:
+        print(f"{name:<22}{us:>10.1f}")
+
+asyncio.run(run())
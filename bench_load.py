@@ -0,0 +1,177 @@
+# Drives the real command and button handlers with simulated players against a
+# throwaway database and reports latency, throughput, Mongo ops and memory.
+#
+#   python bench_load.py --users 2000 --rounds 3 --max-p99-ms 500
+#
+# --scenario open has every player run /open back to back with no pauses, which
+# measures concurrent /open latency and throughput on their own:
+#
+#   python bench_load.py --scenario open --users 500 --rounds 10
+#
+# Needs a MongoDB server (LOAD_TEST_MONGO_URI, default localhost); mongomock lacks
+# the date arithmetic and update semantics the pack commit relies on. The database
+# named by --db is dropped and reseeded on every run.
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+import discord
+from fake_catalog import import_main, start_main
+from fakes import FakeContext, FakeInteraction, FakeUser
+
+latencies = {}
+errors = {}
+
+async def timed_action(name, action):
+    started = time.perf_counter()
+    try:
+        await action
+    except Exception as error:
+        errors[name] = errors.get(name, 0) + 1
+        if errors[name] == 1:
+            print(f"{name} failed: {error!r}")
+    latencies.setdefault(name, []).append(time.perf_counter() - started)
+
+async def run_command(name, user, **options):
+    ctx = FakeContext(user, main.bot)
+    await timed_action(f"command_{name}", getattr(main, name).callback(ctx, **options))
+    return ctx.message
+
+async def click(user, message, label):
+    button = next((item for item in message.buttons() if item.label == label), None)
+    if not button:
+        return False
+    interaction = FakeInteraction(user, message, discord.InteractionType.component, button.custom_id, main.bot)
+    await timed_action(f"button_{button.custom_id.split(':')[0]}", main.route_components(interaction))
+    return True
+
+async def think(rng):
+    await asyncio.sleep(rng.random() * args.think_ms / 1000)
+
+async def play(user, rng):
+    await run_command("begin", user)
+
+    for _ in range(args.rounds):
+        # Top the player back up so every round exercises the full open path.
+        await main.repo.update_user(str(user.id), {"$set": {"packs_left": main.max_packs}})
+
+        await think(rng)
+        message = await run_command("open", user, count=1, booster="default")
+        await think(rng)
+        while await click(user, message, "Next Card") or await click(user, message, "Finish"):
+            if message.embeds and message.embeds[0].title and "All cards pulled" in message.embeds[0].title:
+                break
+            await think(rng)
+
+        await think(rng)
+        message = await run_command("open", user, count=rng.randint(2, main.max_packs - 1), booster="default")
+        for _ in range(2):
+            await think(rng)
+            await click(user, message, "Next")
+
+        await think(rng)
+        message = await run_command("cards", user, sort=rng.choice(["name", "rarity", "set", "count"]))
+        for _ in range(3):
+            await think(rng)
+            await click(user, message, "Next")
+
+        await think(rng)
+        message = await run_command("sets", user)
+        await think(rng)
+        await click(user, message, "Next")
+        await think(rng)
+        await click(user, message, "Summary")
+
+        await think(rng)
+        await run_command("leaderboard", user, board=rng.choice(["collectors", "packs", "rarest"]))
+
+async def open_packs(user, rng):
+    await run_command("begin", user)
+
+    for _ in range(args.rounds):
+        await main.repo.update_user(str(user.id), {"$set": {"packs_left": main.max_packs}})
+        await run_command("open", user, count=1, booster="default")
+
+def percentile(samples, q):
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1] if len(samples) > 1 else samples[0]
+
+def report(elapsed):
+    actions = {}
+    for name, samples in sorted(latencies.items()):
+        mongo_calls = metrics.interaction_mongo_calls.snapshot().get(name)
+        actions[name] = {
+            "count": len(samples),
+            "per_s": round(len(samples) / elapsed, 1),
+            "errors": errors.get(name, 0),
+            "p50_ms": round(percentile(samples, 50) * 1000, 1),
+            "p99_ms": round(percentile(samples, 99) * 1000, 1),
+            "max_ms": round(max(samples) * 1000, 1),
+            "mongo_ops": round(mongo_calls[1] / sum(mongo_calls[0]), 2) if mongo_calls else None
+        }
+
+    total = sum(len(samples) for samples in latencies.values())
+    return {
+        "scenario": args.scenario,
+        "users": args.users,
+        "rounds": args.rounds,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_per_s": round(total / elapsed, 1),
+        "peak_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "limiter": main.interaction_limiter.stats(),
+        "actions": actions
+    }
+
+async def run():
+    await start_main(main, random.Random(args.seed), args.cards, args.sets)
+    await main.repo.refresh_card_stats()
+
+    started = time.perf_counter()
+    scenario = play
+    if args.scenario == "open":
+        # Back to back opens would mostly measure the rate limiter turning them away.
+        main.interaction_limiter.rate = main.interaction_limiter.burst = 1e9
+        scenario = open_packs
+    await asyncio.gather(*[scenario(FakeUser(100000 + i), random.Random(args.seed + i)) for i in range(args.users)])
+    results = report(time.perf_counter() - started)
+
+    print(f"{results['users']} players, {results['rounds']} rounds in {results['elapsed_s']}s: {results['throughput_per_s']} interactions/s, peak RSS {results['peak_rss_mib']} MiB")
+    print(f"Limiter: {results['limiter']}")
+    print(f"{'action':<22}{'count':>8}{'per s':>8}{'errors':>8}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'mongo ops':>11}")
+    for name, stats in results['actions'].items():
+        print(f"{name:<22}{stats['count']:>8}{stats['per_s']:>8}{stats['errors']:>8}{stats['p50_ms']:>9}{stats['p99_ms']:>9}{stats['max_ms']:>9}{str(stats['mongo_ops']):>11}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    main.db.client.drop_database(args.db)
+
+    if args.max_p99_ms is not None:
+        slow = [name for name, stats in results['actions'].items() if stats['p99_ms'] > args.max_p99_ms]
+        if slow or any(errors.values()):
+            print(f"Regression: p99 over {args.max_p99_ms}ms for {slow}, errors {errors}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--cards", type=int, default=5000)
+    parser.add_argument("--sets", type=int, default=40)
+    parser.add_argument("--think-ms", type=int, default=600, help="max pause between a player's actions")
+    parser.add_argument("--scenario", choices=["play", "open"], default="play")
+    parser.add_argument("--db", default="pokemon_tcg_load_test")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--max-p99-ms", type=float, help="exit non-zero if any action's p99 is above this")
+    args = parser.parse_args()
+
+    main = import_main(os.getenv("LOAD_TEST_MONGO_URI", "mongodb://localhost:27017"), args.db)
+    import metrics
+
+    asyncio.run(run())
@@ -0,0 +1,88 @@
+# Shows how the cost of opening a pack and reading a /cards page grows with the size
+# of a player's collection, for the owned_cards collection and for the old layout
+# that kept every card in a nested collected_cards map on the user document.
+#
+#   python bench_owned_cards.py --sizes 100,1000,5000,20000
+#
+# Needs a MongoDB server (--mongo-uri, default localhost). The database named by
+# --db is dropped and reseeded on every run.
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+import bson
+from database import Repository, connect
+from fake_catalog import make_catalog
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--sizes", default="100,1000,5000,20000", help="distinct cards owned by each measured player")
+parser.add_argument("--cards", type=int, default=25000)
+parser.add_argument("--sets", type=int, default=100)
+parser.add_argument("--repeat", type=int, default=50, help="operations to time at each size")
+parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+parser.add_argument("--db", default="pokemon_tcg_bench")
+parser.add_argument("--seed", type=int, default=1)
+args = parser.parse_args()
+
+async def time_ops(op):
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        await op()
+    return (time.perf_counter() - started) / args.repeat * 1000
+
+async def measure(repo, catalog, card_pool, size, rng):
+    user_id = f"owned-{size}"
+    legacy_id = f"legacy-{size}"
+    owned = rng.sample(catalog.cards, size)
+    owned_fields = {card.id: catalog.get_owned_fields(card) for card in catalog.cards}
+
+    collected_cards = {}
+    for card in owned:
+        collected_cards.setdefault(card.set, {})[card.id] = 1
+    await repo.create_user({"user_id": user_id, "packs_left": 10 ** 6, "packs_opened": 0, "last_refill_at": datetime.now(timezone.utc), "set_progress": {}, "distinct_cards": size})
+    await repo.run(repo.owned_cards_col.insert_many, [dict(owned_fields[card.id], user_id=user_id, card_id=card.id, count=1) for card in owned])
+    await repo.create_user({"user_id": legacy_id, "packs_left": 10 ** 6, "collected_cards": collected_cards})
+
+    async def commit():
+        await repo.commit_packs(user_id, card_pool.draw_packs(1, rng=rng), owned_fields)
+
+    async def read_page():
+        await repo.count_owned_cards(user_id)
+        await repo.get_owned_cards_page(user_id, "name", 0, 15)
+
+    async def legacy_commit():
+        # The old open: read the whole user, add the pack, write the whole map back.
+        user_doc = await repo.get_user(legacy_id)
+        for card in card_pool.draw_packs(1, rng=rng)[0]:
+            cards = user_doc['collected_cards'].setdefault(card.set, {})
+            cards[card.id] = cards.get(card.id, 0) + 1
+        await repo.update_user(legacy_id, {"$inc": {"packs_left": -1}})
+        await repo.update_user(legacy_id, {"$set": {"collected_cards": user_doc['collected_cards']}})
+
+    async def legacy_read_page():
+        await repo.get_user(legacy_id)
+
+    user_bytes = len(bson.encode(await repo.get_user(user_id, {"_id": 0})))
+    legacy_bytes = len(bson.encode(await repo.get_user(legacy_id, {"_id": 0})))
+    return size, await time_ops(commit), await time_ops(read_page), user_bytes, await time_ops(legacy_commit), await time_ops(legacy_read_page), legacy_bytes
+
+async def run():
+    rng = random.Random(args.seed)
+    catalog, card_pool = make_catalog(rng, args.cards, args.sets)
+
+    db = connect(args.mongo_uri)[args.db]
+    db.client.drop_database(args.db)
+    repo = Repository(db)
+    await repo.ensure_indexes()
+
+    rows = [await measure(repo, catalog, card_pool, int(size), rng) for size in args.sizes.split(",")]
+
+    print(f"{'owned':>8}{'open ms':>10}{'page ms':>10}{'user KiB':>10}{'old open':>10}{'old page':>10}{'old KiB':>10}")
+    for size, commit_ms, page_ms, user_bytes, legacy_commit_ms, legacy_page_ms, legacy_bytes in rows:
+        print(f"{size:>8}{commit_ms:>10.2f}{page_ms:>10.2f}{user_bytes / 1024:>10.1f}{legacy_commit_ms:>10.2f}{legacy_page_ms:>10.2f}{legacy_bytes / 1024:>10.1f}")
+
+    db.client.drop_database(args.db)
+    repo.executor.shutdown()
+
+asyncio.run(run())
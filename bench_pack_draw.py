@@ -0,0 +1,51 @@
+# Compares booster pack draws from the compiled card pool against the scan the bot
+# used to do, which filtered the whole card list by rarity for every slot.
+#
+#   python bench_pack_draw.py --cards 20000 --seconds 2
+import argparse
+import random
+import time
+from catalog import Card, build_catalog
+from fake_catalog import card_docs
+from pack_engine import rarity_probabilities
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--cards", type=int, default=20000)
+parser.add_argument("--sets", type=int, default=100)
+parser.add_argument("--seconds", type=float, default=2, help="how long to draw with each path")
+parser.add_argument("--seed", type=int, default=1)
+args = parser.parse_args()
+
+def scan_draw(all_cards, rng):
+    # The old path: roll a rarity, then list every card of it, for each of 5 slots.
+    pack = []
+    for _ in range(5):
+        roll = rng.random()
+        for rarity, probability in rarity_probabilities.items():
+            if roll < probability:
+                break
+            roll -= probability
+        pack.append(rng.choice([card for card in all_cards if card.get('rarity') == rarity]))
+    return pack
+
+def packs_per_second(draw):
+    packs = 0
+    started = time.perf_counter()
+    deadline = started + args.seconds
+    while time.perf_counter() < deadline:
+        draw()
+        packs += 1
+    return packs / (time.perf_counter() - started)
+
+docs = card_docs(random.Random(args.seed), args.cards, args.sets)
+catalog, card_pool = build_catalog([Card.from_doc(doc) for doc in docs], [])
+rng = random.Random(args.seed)
+
+scan = packs_per_second(lambda: scan_draw(docs, rng))
+pool = packs_per_second(lambda: card_pool.draw_packs(1, rng=rng))
+batch = packs_per_second(lambda: card_pool.draw_packs(5, rng=rng)) * 5
+
+print(f"{args.cards} cards")
+print(f"{'path':<22}{'packs/s':>12}{'speedup':>10}")
+for name, rate in [("scan", scan), ("card pool", pool), ("card pool, 5 at once", batch)]:
+    print(f"{name:<22}{rate:>12.0f}{rate / scan:>9.0f}x")
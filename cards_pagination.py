@@ -1,51 +1,76 @@
 import discord
 from discord.ui import Button, View
+from catalog import placeholder_image
+from embed_cache import LRUCache
 
-page_states = {}
+cards_per_page = 15
 
-async def update_embed(ctx, user_doc, cards_list, current_page, bot_avatar):
-    cards_per_page = 15
-    total_pages = (len(cards_list) + cards_per_page - 1) // cards_per_page
-    page_cards = cards_list[current_page * cards_per_page:(current_page + 1) * cards_per_page]
+# Rendered pages by (owner, collection_version, page, sort)
+page_embeds = LRUCache("card_pages", 2000)
 
-    embed = discord.Embed(title=f"Your Cards (Page {current_page + 1}/{total_pages-1})")
-    for card_name, card_id, set_name, rarity, count, card_image in page_cards:
-        embed.add_field(name=f"**{card_name}**", value=f"ID: {card_id}\nSet: {set_name}\nRarity: {rarity}\nCount: {count}\n[View]({card_image})", inline=True)
+class CardsView(View):
+    def __init__(self, owner_id, current_page, total_pages, sort="name"):
+        # The owner, page and sort order live in the custom_id, so any click can be
+        # served without per-message state, even after a restart.
+        super().__init__(timeout=None, store=False)
+
+        self.add_item(Button(style=discord.ButtonStyle.primary, label="Previous", custom_id=f"cards:prev:{owner_id}:{current_page}:{sort}", disabled=current_page <= 0))
+        self.add_item(Button(style=discord.ButtonStyle.primary, label="Next", custom_id=f"cards:next:{owner_id}:{current_page}:{sort}", disabled=current_page >= total_pages - 1))
+
+async def update_embed(user, catalog, page_cards, current_page, total_pages, bot_avatar):
+    embed = discord.Embed(title=f"Your Cards (Page {current_page + 1}/{total_pages})")
+    for owned_card in page_cards:
+        card = catalog.cards_by_id.get(owned_card['card_id'])
+        set_name = catalog.set_names.get(owned_card['set'], owned_card['set'])
+        card_image = card.image if card else placeholder_image
+        embed.add_field(name=f"**{owned_card['name']}**", value=f"ID: {owned_card['card_id']}\nSet: {set_name}\nRarity: {owned_card['rarity']}\nCount: {owned_card['count']}\n[View]({card_image})", inline=True)
 
     embed.set_thumbnail(url=bot_avatar)
-    embed.set_author(name=ctx.author.display_name, icon_url=ctx.author.display_avatar.url)
-    
+    embed.set_author(name=user.display_name, icon_url=user.display_avatar.url)
+
     return embed
 
-def create_pagination_buttons():
-    prev_button = Button(style=discord.ButtonStyle.primary, label="Previous", custom_id="prev_card")
-    next_button = Button(style=discord.ButtonStyle.primary, label="Next", custom_id="next_card")
-    return prev_button, next_button
+async def render_page(user, catalog, repo, owner_id, current_page, sort, bot_avatar):
+    # collection_version is bumped after every pack's ownership writes, so it versions
+    # the page cache.
+    user_doc = await repo.get_user(owner_id, {"collection_version": 1})
+    page_key = (owner_id, user_doc.get('collection_version', 0) if user_doc else 0, current_page, sort)
+
+    cached_page = page_embeds.get(page_key)
+    if cached_page:
+        embed_dict, current_page, total_pages = cached_page
+        return discord.Embed.from_dict(embed_dict), CardsView(owner_id, current_page, total_pages, sort)
 
-async def button_callback(interaction, ctx, user_doc, cards_list, view):
-    user_id = str(interaction.user.id)
+    total_cards = await repo.count_owned_cards(owner_id)
+    total_pages = max((total_cards + cards_per_page - 1) // cards_per_page, 1)
+    current_page = min(max(current_page, 0), total_pages - 1)
 
-    current_page = page_states.get(user_id, 0)
+    page_cards = await repo.get_owned_cards_page(owner_id, sort, current_page * cards_per_page, cards_per_page)
+    embed = await update_embed(user, catalog, page_cards, current_page, total_pages, bot_avatar)
+    page_embeds.put(page_key, (embed.to_dict(), current_page, total_pages))
 
-    if interaction.user.id != ctx.author.id:
+    return embed, CardsView(owner_id, current_page, total_pages, sort)
+
+async def handle_cards_button(interaction, args, catalog, repo):
+    action, owner_id, current_page, sort = args[0], args[1], int(args[2]), args[3]
+
+    if str(interaction.user.id) != owner_id:
         return await interaction.response.send_message("This is not your card collection!", ephemeral=True)
 
-    if interaction.custom_id == "prev_card" and current_page > 0:
+    if action == "prev":
         current_page -= 1
-    elif interaction.custom_id == "next_card" and current_page < (len(cards_list) // 18):
+    elif action == "next":
         current_page += 1
 
-    page_states[user_id] = current_page
-
-    embed = await update_embed(ctx, user_doc, cards_list, current_page, ctx.bot.user.display_avatar.url)
+    embed, view = await render_page(interaction.user, catalog, repo, owner_id, current_page, sort, interaction.client.user.display_avatar.url)
 
     await interaction.response.edit_message(embed=embed, view=view)
 
-async def handle_cards(ctx, bot, all_cards, all_sets, users_col, bot_avatar):
+async def handle_cards(ctx, bot, catalog, repo, bot_avatar, sort="name"):
     user_id = str(ctx.author.id)
-    user_doc = users_col.find_one({"user_id": user_id})
+    total_cards = await repo.count_owned_cards(user_id)
 
-    if not user_doc or not user_doc.get('collected_cards'):
+    if not total_cards:
         embed = discord.Embed(
             title="🚨 **You need to begin first!**",
             description=f"\u200b\nUse `/begin` to start playing.\n\n{ctx.author.mention}",
@@ -54,32 +79,6 @@ async def handle_cards(ctx, bot, all_cards, all_sets, users_col, bot_avatar):
         embed.set_thumbnail(url=ctx.author.display_avatar.url)
         return await ctx.respond(embeds=[embed])
 
-    collected_cards = user_doc['collected_cards']
-    cards_list = []
-
-    for card_set, cards in collected_cards.items():
-        set_name = next((s['name'] for s in all_sets if s['id'] == card_set), card_set)
-        for card_id, count in cards.items():
-            card = next((c for c in all_cards if c['id'] == card_id), None)
-            if card:
-                cards_list.append((card['name'], card_id, set_name, card['rarity'], count, card['image']))
-
-    cards_list.sort(key=lambda x: x[0])
-
-    page_states[user_id] = 0
-
-    prev_button, next_button = create_pagination_buttons()
-
-    view = View(timeout=None)
-    view.add_item(prev_button)
-    view.add_item(next_button)
-
-    prev_button.callback = lambda interaction: button_callback(interaction, ctx, user_doc, cards_list, view)
-    next_button.callback = lambda interaction: button_callback(interaction, ctx, user_doc, cards_list, view)
-
-    embed = await update_embed(ctx, user_doc, cards_list, page_states[user_id], bot_avatar)
-
-    embed.set_thumbnail(url=bot_avatar)
-    embed.set_author(name=ctx.author.display_name, icon_url=ctx.author.display_avatar.url)
+    embed, view = await render_page(ctx.author, catalog, repo, user_id, 0, sort, bot_avatar)
 
     await ctx.respond(embed=embed, view=view)
@@ -0,0 +1,202 @@
+from array import array
+from datetime import timedelta
+import sys
+import time
+from pack_engine import CardPool
+
+placeholder_image = 'https://via.placeholder.com/150'
+
+# Only the fields the bot reads are pulled from Mongo
+card_fields = {"id": 1, "name": 1, "rarity": 1, "set": 1, "image": 1, "updated_at": 1}
+set_fields = {"id": 1, "name": 1, "image": 1, "total_cards": 1, "updated_at": 1}
+
+# How far behind the newest updated_at each refresh looks again
+refresh_overlap = timedelta(minutes=5)
+
+def intern_field(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+class Card:
+    __slots__ = ("id", "name", "rarity", "set", "image")
+
+    def __init__(self, id, name, rarity, set, image):
+        self.id = id
+        self.name = name
+        self.rarity = rarity
+        self.set = set
+        self.image = image
+
+    @classmethod
+    def from_doc(cls, doc):
+        # Rarities and set ids repeat across thousands of cards, so each distinct
+        # string is stored once.
+        return cls(
+            doc['id'],
+            doc.get('name', 'Unknown Card'),
+            intern_field(doc.get('rarity')),
+            intern_field(doc.get('set')),
+            doc.get('image', placeholder_image)
+        )
+
+    def as_tuple(self):
+        return (self.id, self.name, self.rarity, self.set, self.image)
+
+class Catalog:
+    def __init__(self, cards, sets):
+        self.cards = cards
+        self.sets = sets
+
+        self.cards_by_id = {card.id: card for card in cards}
+        self.sets_by_id = {s['id']: s for s in sets}
+        self.set_names = {s['id']: s.get('name', 'Unknown Set') for s in sets}
+        self.set_images = {s['id']: s.get('image', placeholder_image) for s in sets}
+        self.sorted_sets = sorted(sets, key=lambda s: s['name'])
+
+        # Filled in from the compiled pack odds by build_catalog
+        self.rarity_ranks = {}
+
+        # A card's handle is its position in self.cards; groupings hold handles in
+        # compact integer arrays rather than lists of references.
+        self.cards_by_rarity = {}
+        self.cards_by_set = {}
+        for handle, card in enumerate(cards):
+            self.cards_by_rarity.setdefault(card.rarity, array('I')).append(handle)
+            self.cards_by_set.setdefault(card.set, array('I')).append(handle)
+
+    def get_owned_fields(self, card):
+        return {
+            "set": card.set,
+            "name": card.name,
+            "rarity": card.rarity or 'Unknown Rarity',
+            "rarity_rank": self.rarity_ranks.get(card.rarity, -1)
+        }
+
+def build_catalog(cards, sets, pack_definitions=None):
+    catalog = Catalog(cards, sets)
+    card_pool = CardPool(catalog, pack_definitions)
+    catalog.rarity_ranks = card_pool.rarity_ranks
+    return catalog, card_pool
+
+def get_watermark(docs, watermark=None):
+    for doc in docs:
+        updated_at = doc.get('updated_at')
+        if updated_at and (watermark is None or updated_at > watermark):
+            watermark = updated_at
+    return watermark
+
+def changed_since(watermark):
+    # Every document carries updated_at once stamped. The window starts a little
+    # before the watermark so writes stamped by a lagging clock, or committed out of
+    # order, are still seen; documents that come back unchanged are skipped.
+    return {"updated_at": {"$gte": watermark - refresh_overlap}} if watermark else {}
+
+class CatalogManager:
+    def __init__(self, repo, leader=None):
+        self.repo = repo
+        # Only the lease holder writes the owned_cards copies; without a lease this
+        # process always does.
+        self.leader = leader
+        self.reconciled = False
+        self.catalog = None
+        self.card_pool = None
+        self.card_watermark = None
+        self.set_watermark = None
+        self.pack_definitions = []
+        self.swap_listeners = []
+
+    async def load(self):
+        if self.catalog is not None:
+            return
+
+        started = time.perf_counter()
+
+        await self.repo.stamp_catalog_updates()
+        card_docs = await self.repo.load_cards(card_fields)
+        sets = await self.repo.load_sets(set_fields)
+        self.pack_definitions = await self.repo.load_pack_definitions()
+        self.card_watermark = get_watermark(card_docs)
+        self.set_watermark = get_watermark(sets)
+        cards = [Card.from_doc(doc) for doc in card_docs]
+        del card_docs
+        self.swap(cards, sets)
+
+        print(f"Loaded {len(cards)} cards, {len(sets)} sets and {len(self.card_pool.boosters)} boosters into memory in {time.perf_counter() - started:.2f}s.")
+
+    def owns_writes(self):
+        return self.leader is None or self.leader.held
+
+    async def refresh(self):
+        # A process that takes over the owned_cards writes first reconciles every copy,
+        # which covers edits made while no process, or another one, was writing them.
+        if not self.owns_writes():
+            self.reconciled = False
+        elif not self.reconciled:
+            await self.reconcile_owned_cards()
+            self.reconciled = True
+
+        await self.repo.stamp_catalog_updates()
+        card_docs = await self.repo.load_cards(card_fields, changed_since(self.card_watermark))
+        sets = await self.repo.load_sets(set_fields, changed_since(self.set_watermark))
+        # Definitions are a handful of small documents, so they are compared whole.
+        pack_definitions = await self.repo.load_pack_definitions()
+        definitions_changed = pack_definitions != self.pack_definitions
+
+        self.card_watermark = get_watermark(card_docs, self.card_watermark)
+        self.set_watermark = get_watermark(sets, self.set_watermark)
+
+        old_catalog = self.catalog
+        changed_cards = [
+            card for card in (Card.from_doc(doc) for doc in card_docs)
+            if card.id not in old_catalog.cards_by_id or old_catalog.cards_by_id[card.id].as_tuple() != card.as_tuple()
+        ]
+        changed_sets = [s for s in sets if old_catalog.sets_by_id.get(s['id']) != s]
+        if not changed_cards and not changed_sets and not definitions_changed:
+            return 0
+
+        self.pack_definitions = pack_definitions
+
+        cards_by_id = dict(old_catalog.cards_by_id)
+        cards_by_id.update((card.id, card) for card in changed_cards)
+        sets_by_id = dict(old_catalog.sets_by_id)
+        sets_by_id.update((s['id'], s) for s in changed_sets)
+        self.swap(list(cards_by_id.values()), list(sets_by_id.values()))
+        if self.owns_writes():
+            await self.sync_owned_cards(old_catalog, changed_cards)
+
+        print(f"Catalog refreshed: {len(changed_cards)} cards and {len(changed_sets)} sets added or changed{', pack definitions reloaded' if definitions_changed else ''}.")
+        return len(changed_cards) + len(changed_sets) + definitions_changed
+
+    async def sync_owned_cards(self, old_catalog, changed_cards):
+        # owned_cards copies each card's name, set, rarity and rank for sorting, so
+        # edits to existing cards and ranks moved by new pack odds are written through.
+        fields_by_card = {}
+        for card in changed_cards:
+            old_card = old_catalog.cards_by_id.get(card.id)
+            owned_fields = self.catalog.get_owned_fields(card)
+            if old_card and old_catalog.get_owned_fields(old_card) != owned_fields:
+                fields_by_card[card.id] = owned_fields
+        ranks_by_rarity = {rarity: rank for rarity, rank in self.catalog.rarity_ranks.items() if old_catalog.rarity_ranks.get(rarity) != rank}
+        await self.repo.sync_owned_cards(fields_by_card, ranks_by_rarity)
+
+    async def reconcile_owned_cards(self):
+        fields_by_card = {}
+        for copy in await self.repo.get_owned_card_copies():
+            card = self.catalog.cards_by_id.get(copy['card_id'])
+            if not card:
+                continue
+            owned_fields = self.catalog.get_owned_fields(card)
+            if any(copy.get(field) != value for field, value in owned_fields.items()):
+                fields_by_card[card.id] = owned_fields
+        await self.repo.sync_owned_cards(fields_by_card, {})
+        print(f"Reconciled owned_cards with the catalog: {len(fields_by_card)} cards rewritten.")
+        return len(fields_by_card)
+
+    def swap(self, cards, sets):
+        # Both indexes are built before either is published, and there is no await in
+        # between, so a command never sees a catalog and card pool that disagree.
+        catalog, card_pool = build_catalog(cards, sets, self.pack_definitions)
+        self.catalog = catalog
+        self.card_pool = card_pool
+
+        for listener in self.swap_listeners:
+            listener()
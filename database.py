@@ -0,0 +1,315 @@
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+from datetime import datetime, timezone
+from functools import partial
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.mongo_client import MongoClient
+import uuid
+import metrics
+
+pool_size = 50
+
+# How many recent commit ids each owned card keeps to make replays idempotent
+applied_commits_kept = 20
+
+owned_card_sorts = {
+    "name": [("name", ASCENDING), ("card_id", ASCENDING)],
+    "rarity": [("rarity_rank", DESCENDING), ("name", ASCENDING), ("card_id", ASCENDING)],
+    "set": [("set", ASCENDING), ("name", ASCENDING), ("card_id", ASCENDING)],
+    "count": [("count", DESCENDING), ("name", ASCENDING), ("card_id", ASCENDING)]
+}
+
+# Rankings read straight off an index on the users collection
+leaderboards = {
+    "collectors": [("distinct_cards", DESCENDING), ("user_id", ASCENDING)],
+    "packs": [("packs_opened", DESCENDING), ("user_id", ASCENDING)]
+}
+rarest_cards_sort = [("owners", ASCENDING), ("rarity_rank", DESCENDING), ("card_id", ASCENDING)]
+
+def connect(mongo_uri):
+    return MongoClient(
+        mongo_uri,
+        maxPoolSize=pool_size,
+        minPoolSize=5,
+        maxIdleTimeMS=300000,
+        waitQueueTimeoutMS=10000,
+        retryWrites=True,
+        tz_aware=True,
+        event_listeners=metrics.event_listeners()
+    )
+
+class Repository:
+    def __init__(self, db):
+        self.cards_col = db['cards']
+        self.sets_col = db['sets']
+        self.users_col = db['users']
+        self.sessions_col = db['sessions']
+        self.owned_cards_col = db['owned_cards']
+        self.pack_definitions_col = db['pack_definitions']
+        self.card_stats_col = db['card_stats']
+        self.leases_col = db['leases']
+        # pymongo is blocking, so every call runs on a dedicated pool sized to the
+        # connection pool and the gateway loop never waits on a Mongo round-trip.
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="mongo")
+
+    async def run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # The caller's context travels with the call so Mongo time is charged to it.
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, partial(context.run, func, *args, **kwargs))
+
+    async def ensure_indexes(self):
+        await self.run(self.users_col.create_index, [("user_id", ASCENDING)], unique=True)
+        await self.run(self.cards_col.create_index, [("updated_at", ASCENDING)], sparse=True)
+        await self.run(self.sets_col.create_index, [("updated_at", ASCENDING)], sparse=True)
+        await self.run(self.sessions_col.create_index, [("expires_at", ASCENDING)], expireAfterSeconds=0)
+        await self.run(self.owned_cards_col.create_index, [("user_id", ASCENDING), ("card_id", ASCENDING)], unique=True)
+        await self.run(self.owned_cards_col.create_index, [("card_id", ASCENDING)])
+        for sort in owned_card_sorts.values():
+            await self.run(self.owned_cards_col.create_index, [("user_id", ASCENDING)] + sort)
+        for sort in leaderboards.values():
+            await self.run(self.users_col.create_index, sort)
+        await self.run(self.card_stats_col.create_index, [("card_id", ASCENDING)], unique=True)
+        await self.run(self.card_stats_col.create_index, rarest_cards_sort)
+
+    async def load_cards(self, projection=None, query=None):
+        return await self.run(lambda: list(self.cards_col.find(query or {}, projection)))
+
+    async def load_sets(self, projection=None, query=None):
+        return await self.run(lambda: list(self.sets_col.find(query or {}, projection)))
+
+    async def stamp_catalog_updates(self):
+        # Cards and sets written without updated_at, e.g. by a bulk import, are stamped
+        # with the server's clock so the catalog refresh sees them.
+        for col in (self.cards_col, self.sets_col):
+            await self.run(col.update_many, {"updated_at": {"$exists": False}}, [{"$set": {"updated_at": "$$NOW"}}])
+
+    async def sync_owned_cards(self, fields_by_card, ranks_by_rarity):
+        requests = [UpdateMany({"card_id": card_id}, {"$set": fields}) for card_id, fields in fields_by_card.items()]
+        requests += [UpdateMany({"rarity": rarity, "rarity_rank": {"$ne": rank}}, {"$set": {"rarity_rank": rank}}) for rarity, rank in ranks_by_rarity.items()]
+        if requests:
+            await self.run(self.owned_cards_col.bulk_write, requests, ordered=False)
+
+    async def get_owned_card_copies(self):
+        # One row per distinct catalog copy held in owned_cards, normally one per card
+        pipeline = [
+            {"$group": {"_id": {"card_id": "$card_id", "name": "$name", "set": "$set", "rarity": "$rarity", "rarity_rank": "$rarity_rank"}}},
+            {"$replaceWith": "$_id"}
+        ]
+        return await self.run(lambda: list(self.owned_cards_col.aggregate(pipeline, allowDiskUse=True)))
+
+    async def load_pack_definitions(self):
+        return await self.run(lambda: list(self.pack_definitions_col.find({"enabled": {"$ne": False}}, {"_id": 0}).sort("id", ASCENDING)))
+
+    async def get_user(self, user_id, projection=None):
+        return await self.run(self.users_col.find_one, {"user_id": user_id}, projection)
+
+    async def create_user(self, user_doc):
+        return await self.run(self.users_col.insert_one, user_doc)
+
+    async def update_user(self, user_id, update):
+        return await self.run(self.users_col.update_one, {"user_id": user_id}, update)
+
+    async def commit_packs(self, user_id, packs, owned_fields):
+        # Every pack is paid for in the same guarded update, so a batch opens whole or
+        # not at all. Duplicate pulls are folded into one update per card; Mongo
+        # rejects an update that touches the same path twice.
+        cards = [card for pack in packs for card in pack]
+        pulled = Counter(card.id for card in cards)
+        inc = {"packs_left": -len(packs), "packs_opened": len(packs)}
+        inc.update(Counter(f"set_progress.{card.set}.copies" for card in cards))
+
+        # The cards are journaled on the user in the same write that charges for them.
+        # If the ownership writes below are cut short, the next refresh_packs replays
+        # the commit, so a charged pack is never left without its cards.
+        commit = {
+            "id": uuid.uuid4().hex,
+            "at": datetime.now(timezone.utc),
+            "cards": [{"card_id": card_id, "count": count, "fields": owned_fields[card_id]} for card_id, count in pulled.items()]
+        }
+
+        user_doc = await self.run(
+            self.users_col.find_one_and_update,
+            {"user_id": user_id, "packs_left": {"$gte": len(packs)}},
+            {"$inc": inc, "$push": {"pending_commits": commit}},
+            projection={"_id": 0, "packs_left": 1, "packs_opened": 1, "last_refill_at": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if not user_doc:
+            return None
+
+        owned_cards = await self.apply_commit(user_id, commit)
+        user_doc['owned_counts'] = {owned['card_id']: owned['count'] for owned in owned_cards}
+        return user_doc
+
+    async def apply_owned_cards(self, user_id, commit):
+        # Each card remembers the commits recently applied to it, so replaying a commit
+        # never counts its cards twice. All of a commit's cards go in one bulk write,
+        # so a commit holds a single executor thread however many cards it has.
+        def card_update(card):
+            query = {"user_id": user_id, "card_id": card['card_id'], "commits": {"$ne": commit['id']}}
+            update = {
+                "$inc": {"count": card['count']},
+                "$push": {"commits": {"$each": [commit['id']], "$slice": -applied_commits_kept}}
+            }
+            return query, update
+
+        upserts = []
+        for card in commit['cards']:
+            query, update = card_update(card)
+            upserts.append(UpdateOne(query, dict(update, **{"$setOnInsert": dict(card['fields'], first_commit=commit['id'])}), upsert=True))
+        try:
+            await self.run(self.owned_cards_col.bulk_write, upserts, ordered=False)
+        except BulkWriteError as error:
+            write_errors = error.details['writeErrors']
+            if any(write_error['code'] != 11000 for write_error in write_errors):
+                raise
+            # Those cards already exist: either this commit was applied to them before,
+            # or another commit inserted them first. Only the latter still need the $inc.
+            await self.run(self.owned_cards_col.bulk_write, [UpdateOne(*card_update(commit['cards'][write_error['index']])) for write_error in write_errors], ordered=False)
+
+    async def apply_commit(self, user_id, commit):
+        # Safe to run more than once, including concurrently: every card update is
+        # idempotent, and only the run that clears the journal entry adds the distinct
+        # counts. Whoever gets that far has seen every card update land.
+        await self.apply_owned_cards(user_id, commit)
+
+        owned_cards = await self.run(
+            lambda: list(self.owned_cards_col.find(
+                {"user_id": user_id, "card_id": {"$in": [card['card_id'] for card in commit['cards']]}},
+                {"_id": 0, "card_id": 1, "set": 1, "count": 1, "first_commit": 1}
+            ))
+        )
+
+        # collection_version moves only once the ownership writes have landed, so a
+        # page cached under the new version can't hold the old collection.
+        inc = {"collection_version": 1}
+        new_cards = Counter(owned['set'] for owned in owned_cards if owned.get('first_commit') == commit['id'])
+        if new_cards:
+            inc.update({f"set_progress.{set_id}.distinct": count for set_id, count in new_cards.items()})
+            inc["distinct_cards"] = sum(new_cards.values())
+        await self.run(
+            self.users_col.update_one,
+            {"user_id": user_id, "pending_commits.id": commit['id']},
+            {"$pull": {"pending_commits": {"id": commit['id']}}, "$inc": inc}
+        )
+
+        return owned_cards
+
+    async def replay_pending_commits(self, user_id, pending_commits):
+        for commit in pending_commits:
+            print(f"Replaying pack commit {commit['id']} for user {user_id}.")
+            await self.apply_commit(user_id, commit)
+
+    async def get_owned_cards_page(self, user_id, sort, skip, limit):
+        return await self.run(
+            lambda: list(
+                self.owned_cards_col.find({"user_id": user_id}, {"_id": 0})
+                .sort(owned_card_sorts[sort])
+                .skip(skip)
+                .limit(limit)
+            )
+        )
+
+    async def count_owned_cards(self, user_id):
+        return await self.run(self.owned_cards_col.count_documents, {"user_id": user_id})
+
+    async def get_leaderboard(self, board, limit):
+        field = leaderboards[board][0][0]
+        return await self.run(
+            lambda: list(
+                self.users_col.find({field: {"$gt": 0}}, {"_id": 0, "user_id": 1, "distinct_cards": 1, "packs_opened": 1})
+                .sort(leaderboards[board])
+                .limit(limit)
+            )
+        )
+
+    async def get_rarest_cards(self, limit):
+        return await self.run(lambda: list(self.card_stats_col.find({}, {"_id": 0}).sort(rarest_cards_sort).limit(limit)))
+
+    async def refresh_card_stats(self):
+        # Rebuilds the per-card owner counts inside Mongo; only the scan's result is
+        # written back, so reads of card_stats stay a bounded index walk.
+        pipeline = [
+            {"$group": {
+                "_id": "$card_id",
+                "owners": {"$sum": 1},
+                "copies": {"$sum": "$count"},
+                "name": {"$first": "$name"},
+                "set": {"$first": "$set"},
+                "rarity": {"$first": "$rarity"},
+                "rarity_rank": {"$first": "$rarity_rank"}
+            }},
+            {"$project": {"_id": 0, "card_id": "$_id", "owners": 1, "copies": 1, "name": 1, "set": 1, "rarity": 1, "rarity_rank": 1, "updated_at": "$$NOW"}},
+            {"$merge": {"into": self.card_stats_col.name, "on": "card_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+        ]
+        await self.run(lambda: list(self.owned_cards_col.aggregate(pipeline, allowDiskUse=True)))
+
+    async def refresh_packs(self, user_id, interval, max_packs):
+        now = datetime.now(timezone.utc)
+        interval_ms = interval.total_seconds() * 1000
+        last_refill_at = {"$ifNull": ["$last_refill_at", now]}
+        refilled = {"$add": ["$packs_left", "$_due"]}
+
+        # Packs accrue one per interval since last_refill_at and are granted on read.
+        # A full user's clock is held at "now" so the next pack is a full interval
+        # after they drop below the cap. Refills stop at the cap but never take away
+        # packs above it, e.g. ones granted by an admin or a promotion.
+        user_doc = await self.run(
+            self.users_col.find_one_and_update,
+            {"user_id": user_id},
+            [
+                {"$set": {"_due": {"$floor": {"$divide": [{"$subtract": [now, last_refill_at]}, interval_ms]}}}},
+                {"$set": {
+                    "packs_left": {"$max": ["$packs_left", {"$min": [max_packs, refilled]}]},
+                    "last_refill_at": {"$cond": [
+                        {"$gte": [refilled, max_packs]},
+                        now,
+                        {"$add": [last_refill_at, {"$multiply": ["$_due", interval_ms]}]}
+                    ]}
+                }},
+                {"$unset": "_due"}
+            ],
+            projection={"_id": 0, "packs_left": 1, "last_refill_at": 1, "pending_commits": 1},
+            return_document=ReturnDocument.AFTER
+        )
+
+        if user_doc and user_doc.get('pending_commits'):
+            await self.replay_pending_commits(user_id, user_doc['pending_commits'])
+        if user_doc:
+            user_doc.pop('pending_commits', None)
+        return user_doc
+
+    async def acquire_lease(self, name, holder, ttl):
+        # Expiry is judged by the server's clock so processes with skewed clocks
+        # can't both believe they hold the lease.
+        try:
+            lease = await self.run(
+                self.leases_col.find_one_and_update,
+                {"_id": name, "$or": [{"holder": holder}, {"$expr": {"$lt": ["$expires_at", "$$NOW"]}}]},
+                [{"$set": {"holder": holder, "expires_at": {"$add": ["$$NOW", int(ttl * 1000)]}}}],
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Another process holds an unexpired lease, so the upsert collided with it.
+            return False
+        return lease is not None and lease['holder'] == holder
+
+    async def load_session(self, store, key):
+        session_doc = await self.run(
+            self.sessions_col.find_one,
+            {"_id": f"{store}:{key}", "expires_at": {"$gt": datetime.now(timezone.utc)}}
+        )
+        return session_doc['data'] if session_doc else None
+
+    async def save_session(self, store, key, data, expires_at):
+        await self.run(
+            self.sessions_col.replace_one,
+            {"_id": f"{store}:{key}"},
+            {"data": data, "expires_at": expires_at},
+            upsert=True
+        )
@@ -0,0 +1,53 @@
+# Generated card catalogs for the benchmarks and the load test: card and set
+# documents with a realistic rarity mix, built into a catalog in memory or seeded
+# into a throwaway database that main is then started against.
+import os
+from datetime import datetime, timezone
+from catalog import Card, build_catalog
+from fakes import FakeUser
+
+rarities = ["Common"] * 60 + ["Uncommon"] * 25 + ["Rare"] * 10 + ["Rare Holo"] * 4 + ["Rare Secret"]
+
+def card_docs(rng, card_count, set_count):
+    return [
+        {"id": f"set{i % set_count}-{i}", "name": f"Card {i}", "rarity": rng.choice(rarities), "set": f"set{i % set_count}", "image": f"https://cdn.example/cards/{i}.png"}
+        for i in range(card_count)
+    ]
+
+def set_docs(set_count):
+    return [{"id": f"set{i}", "name": f"Set {i}", "image": f"https://cdn.example/sets/{i}.png"} for i in range(set_count)]
+
+def make_catalog(rng, card_count, set_count):
+    cards = [Card.from_doc(doc) for doc in card_docs(rng, card_count, set_count)]
+    return build_catalog(cards, set_docs(set_count))
+
+def seed_catalog(db, rng, card_count, set_count):
+    db.client.drop_database(db.name)
+    now = datetime.now(timezone.utc)
+    cards = [dict(doc, updated_at=now) for doc in card_docs(rng, card_count, set_count)]
+    sets = set_docs(set_count)
+    for i, set_data in enumerate(sets):
+        set_data['total_cards'] = len(range(i, card_count, set_count))
+    db['sets'].insert_many(sets)
+    db['cards'].insert_many(cards)
+
+def import_main(mongo_uri, db_name):
+    # Set before main is imported: it connects and picks its database at import time,
+    # and metrics decide whether to instrument when the handlers are decorated.
+    os.environ["MONGO_URI"] = mongo_uri
+    os.environ["MONGO_DB"] = db_name
+    os.environ["METRICS_ENABLED"] = "1"
+    os.environ.pop("METRICS_PORT", None)
+
+    import main
+    return main
+
+async def start_main(main, rng, card_count, set_count):
+    # What on_ready would do, minus the gateway: a seeded catalog in memory and a
+    # bot user for the embeds to name.
+    seed_catalog(main.db, rng, card_count, set_count)
+    await main.repo.ensure_indexes()
+    await main.catalog_manager.load()
+
+    main.pika = ":pika:"
+    main.bot._connection.user = FakeUser(0)
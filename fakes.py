@@ -0,0 +1,61 @@
+# Stand-ins for the Discord objects the command and button handlers touch, used by
+# the load test and the tests to drive the handlers without a gateway connection.
+import discord
+
+class FakeAvatar:
+    def __init__(self, url):
+        self.url = url
+
+class FakeUser:
+    def __init__(self, id):
+        self.id = id
+        self.mention = f"<@{id}>"
+        self.display_name = f"player{id}"
+        self.display_avatar = FakeAvatar(f"https://cdn.example/avatars/{id}.png")
+
+class FakeResponse:
+    def __init__(self, message):
+        self.message = message
+
+    async def send_message(self, content=None, embed=None, embeds=None, view=None, ephemeral=False):
+        self.message.record(embed, embeds, view, content)
+
+    async def edit_message(self, embed=None, embeds=None, view=None):
+        self.message.record(embed, embeds, view)
+
+    async def defer(self):
+        self.message.deferred = True
+
+class FakeMessage:
+    def __init__(self):
+        self.content = None
+        self.embeds = []
+        self.view = None
+        self.deferred = False
+
+    def record(self, embed, embeds, view, content=None):
+        self.content = content
+        self.embeds = embeds or ([embed] if embed else [])
+        if view is not None:
+            self.view = view
+
+    def buttons(self):
+        return [item for item in (self.view.children if self.view else []) if not item.disabled]
+
+class FakeInteraction:
+    def __init__(self, user, message, type, custom_id=None, client=None):
+        self.user = user
+        self.type = type
+        self.custom_id = custom_id
+        self.client = client
+        self.response = FakeResponse(message)
+
+class FakeContext:
+    def __init__(self, user, client=None):
+        self.author = user
+        self.user = user
+        self.message = FakeMessage()
+        self.interaction = FakeInteraction(user, self.message, discord.InteractionType.application_command, client=client)
+
+    async def respond(self, content=None, embed=None, embeds=None, view=None, ephemeral=False, allowed_mentions=None):
+        self.message.record(embed, embeds, view, content)
@@ -0,0 +1,41 @@
+import os
+import socket
+import time
+import uuid
+from pymongo.errors import PyMongoError
+
+class LeaderLease:
+    def __init__(self, repo, name, ttl=90):
+        self.repo = repo
+        self.name = name
+        self.ttl = ttl
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.held_until = 0
+
+    async def renew(self):
+        # Leadership is only trusted locally for half the lease, so a process that
+        # stalls stops running singleton jobs well before another can take over.
+        started = time.monotonic()
+        try:
+            acquired = await self.repo.acquire_lease(self.name, self.holder, self.ttl)
+        except PyMongoError as error:
+            # Without a confirmed renewal the lease can't be trusted, so it counts as
+            # lost until a later renewal gets through.
+            print(f"Renewing lease {self.name} failed: {error!r}")
+            acquired = False
+        if acquired:
+            if not self.held:
+                print(f"Acquired lease {self.name} as {self.holder}.")
+            self.held_until = started + self.ttl / 2
+        else:
+            if self.held:
+                print(f"Lost lease {self.name}.")
+            self.held_until = 0
+        return self.held
+
+    @property
+    def held(self):
+        return time.monotonic() < self.held_until
+
+    def stats(self):
+        return {"held": int(self.held)}
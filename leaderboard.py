@@ -0,0 +1,52 @@
+import discord
+
+leaderboard_size = 10
+medals = ["🥇", "🥈", "🥉"]
+
+board_titles = {
+    "collectors": "🏆 Top Collectors",
+    "packs": "📦 Most Packs Opened",
+    "rarest": "💎 Rarest Pulls"
+}
+
+def rank_prefix(position):
+    return medals[position] if position < len(medals) else f"**{position + 1}.**"
+
+def collector_lines(rows, board):
+    if board == "collectors":
+        return [f"{rank_prefix(i)} <@{row['user_id']}>: {row.get('distinct_cards', 0)} cards" for i, row in enumerate(rows)]
+    return [f"{rank_prefix(i)} <@{row['user_id']}>: {row.get('packs_opened', 0)} packs" for i, row in enumerate(rows)]
+
+def rarest_lines(catalog, rows):
+    lines = []
+    for i, row in enumerate(rows):
+        set_name = catalog.set_names.get(row['set'], row['set'])
+        lines.append(f"{rank_prefix(i)} **{row['name']}** ({row['rarity']}, {set_name}): owned by {row['owners']} player{'s' if row['owners'] != 1 else ''}")
+    return lines
+
+async def handle_leaderboard(ctx, bot, catalog, repo, board="collectors"):
+    if board == "rarest":
+        rows = await repo.get_rarest_cards(leaderboard_size)
+        lines = rarest_lines(catalog, rows)
+    else:
+        rows = await repo.get_leaderboard(board, leaderboard_size)
+        lines = collector_lines(rows, board)
+
+    if not lines:
+        embed = discord.Embed(
+            title=board_titles[board],
+            description=f"\u200b\nNo one is on this leaderboard yet.\nUse `/open` to start collecting!\n\n{ctx.author.mention}",
+            color=0xe74c3c
+        )
+        return await ctx.respond(embeds=[embed])
+
+    embed = discord.Embed(
+        title=board_titles[board],
+        description="\n".join(lines) + f"\n\n{ctx.author.mention}",
+        color=0x3498db
+    )
+    embed.set_thumbnail(url=bot.user.display_avatar.url)
+    if board == "rarest":
+        embed.set_footer(text="Owner counts are refreshed every 30 minutes.")
+
+    await ctx.respond(embeds=[embed], allowed_mentions=discord.AllowedMentions.none())
@@ -0,0 +1,102 @@
+import asyncio
+import functools
+import time
+from collections import OrderedDict
+import discord
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, tokens, updated_at):
+        self.tokens = tokens
+        self.updated_at = updated_at
+
+class UserLimiter:
+    def __init__(self, name, rate=1.0, burst=5, max_waiting=2, max_users=50000):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_waiting = max_waiting
+        self.max_users = max_users
+
+        # Buckets are kept LRU-bounded; a user whose bucket is evicted simply starts
+        # again with a full one.
+        self.buckets = OrderedDict()
+        self.locks = {}
+        self.pending = {}
+        self.in_flight = set()
+
+        self.allowed = 0
+        self.rejected = 0
+        self.coalesced = 0
+        self.shed = 0
+
+    def take_token(self, user_id):
+        now = time.monotonic()
+        bucket = self.buckets.get(user_id)
+        if bucket is None:
+            bucket = self.buckets[user_id] = TokenBucket(self.burst, now)
+            while len(self.buckets) > self.max_users:
+                self.buckets.popitem(last=False)
+        else:
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated_at) * self.rate)
+            bucket.updated_at = now
+        self.buckets.move_to_end(user_id)
+
+        if bucket.tokens < 1:
+            return (1 - bucket.tokens) / self.rate
+        bucket.tokens -= 1
+        return 0
+
+    async def run(self, interaction, key, handler):
+        user_id = interaction.user.id
+
+        # A repeat of a request that is still running (a double-clicked button, a
+        # re-sent command) is folded into the first one instead of running twice.
+        if (user_id, key) in self.in_flight:
+            self.coalesced += 1
+            if interaction.type == discord.InteractionType.component:
+                return await interaction.response.defer()
+            return await interaction.response.send_message("Still working on your last request, hang on!", ephemeral=True)
+
+        retry_after = self.take_token(user_id)
+        if retry_after:
+            self.rejected += 1
+            return await interaction.response.send_message(f"You're going too fast! Try again in {retry_after:.1f}s.", ephemeral=True)
+
+        # Each user's requests run one at a time; past a short queue, bursts are shed.
+        if self.pending.get(user_id, 0) > self.max_waiting:
+            self.shed += 1
+            return await interaction.response.send_message("You're going too fast! Try again in a moment.", ephemeral=True)
+
+        self.in_flight.add((user_id, key))
+        self.pending[user_id] = self.pending.get(user_id, 0) + 1
+        lock = self.locks.setdefault(user_id, asyncio.Lock())
+        try:
+            async with lock:
+                self.allowed += 1
+                return await handler()
+        finally:
+            self.in_flight.discard((user_id, key))
+            self.pending[user_id] -= 1
+            if not self.pending[user_id]:
+                del self.pending[user_id]
+                del self.locks[user_id]
+
+    def guard(self, key=None):
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(ctx, *args, **kwargs):
+                return await self.run(ctx.interaction, key or func.__name__, lambda: func(ctx, *args, **kwargs))
+            return wrapper
+        return decorator
+
+    def stats(self):
+        return {
+            "users": len(self.buckets),
+            "in_flight": len(self.in_flight),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "coalesced": self.coalesced,
+            "shed": self.shed
+        }
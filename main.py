@@ -1,89 +1,88 @@
-import asyncio
+from datetime import datetime, timedelta, timezone
 import discord
-from discord.ext import commands
-from discord.ui import Button, View
+from discord.ext import commands, tasks
 from dotenv import load_dotenv
 import os
-from pymongo.mongo_client import MongoClient
-import random
+from pymongo.errors import PyMongoError
 import uuid
-from cards_pagination import handle_cards
-from sets_pagination import handle_sets
+from database import Repository, connect, leaderboards, owned_card_sorts
+from catalog import CatalogManager
+from leader import LeaderLease
+from leaderboard import handle_leaderboard
+from limits import UserLimiter
+import metrics
+from pack_reveal import RevealView, build_pack_state, card_embeds, format_countdown, handle_reveal_button
+from pack_summary import handle_summary_button, render_summary_page
+from sessions import SessionStore
+from cards_pagination import handle_cards, handle_cards_button, page_embeds
+from sets_pagination import handle_sets, handle_sets_button
 
 load_dotenv()
 
 mongo_uri = os.getenv("MONGO_URI")
 discord_token = os.environ.get("DISCORD_TOKEN")
 
-mongo = MongoClient(mongo_uri)
-bot = commands.Bot(command_prefix="!", intents=discord.Intents.default())
-
-db = mongo['pokemon_tcg']
-cards_col = db['cards']
-sets_col = db['sets']
-users_col = db['users']
-
-all_cards = []
-all_sets = []
-user_states = {}
-page_states = {}
-
-rarity_probabilities = {
-    "Common": 0.70,
-    "Uncommon": 0.20,
-    "Rare": 0.08,
-    "Rare Holo": 0.015,
-    "Rare Secret": 0.005
-}
-
-def get_cards_by_rarity(rarity):
-    return [card for card in all_cards if card.get('rarity') == rarity]
-
-def roll_rarity():
-    roll = random.random()
-    if roll < rarity_probabilities["Common"]:
-        return "Common"
-    elif roll < rarity_probabilities["Common"] + rarity_probabilities["Uncommon"]:
-        return "Uncommon"
-    elif roll < rarity_probabilities["Common"] + rarity_probabilities["Uncommon"] + rarity_probabilities["Rare"]:
-        return "Rare"
-    elif roll < rarity_probabilities["Common"] + rarity_probabilities["Uncommon"] + rarity_probabilities["Rare"] + rarity_probabilities["Rare Holo"]:
-        return "Rare Holo"
-    else:
-        return "Rare Secret"
+# Each process runs the shards listed in SHARD_IDS out of SHARD_COUNT; with
+# neither set, one process runs as many shards as Discord recommends.
+shard_count = int(os.getenv("SHARD_COUNT", "0")) or None
+try:
+    shard_ids = [int(shard_id) for shard_id in os.getenv("SHARD_IDS", "").split(",") if shard_id.strip()] or None
+except ValueError:
+    raise SystemExit(f"SHARD_IDS must be a comma separated list of shard numbers, got {os.getenv('SHARD_IDS')!r}.")
+if shard_ids and not shard_count:
+    raise SystemExit("SHARD_IDS needs SHARD_COUNT, the total number of shards across all processes.")
+if shard_ids and any(shard_id < 0 or shard_id >= shard_count for shard_id in shard_ids):
+    raise SystemExit(f"SHARD_IDS must be between 0 and {shard_count - 1} when SHARD_COUNT is {shard_count}.")
 
-def select_booster_pack():
-    booster_pack = []
-    
-    for _ in range(5): 
-        rarity = roll_rarity()
-        possible_cards = get_cards_by_rarity(rarity)
-        card = random.choice(possible_cards) 
-        booster_pack.append(card)
+mongo = connect(mongo_uri)
+bot = commands.AutoShardedBot(command_prefix="!", intents=discord.Intents.default(), shard_count=shard_count, shard_ids=shard_ids)
 
-    return booster_pack
+db = mongo[os.getenv("MONGO_DB", "pokemon_tcg")]
+repo = Repository(db)
 
-def get_card_collection_count(user_id, card_id, set_id):
-    user_doc = users_col.find_one({"user_id": user_id})
-    
-    set_collection = user_doc.get('collected_cards', {}).get(set_id, {})
-    return set_collection.get(card_id, 0)
+pack_interval = timedelta(hours=4)
+max_packs = 5
+
+# Jobs that must run in only one process across all shards
+singleton_lease = LeaderLease(repo, "singleton_jobs")
+
+catalog_manager = CatalogManager(repo, leader=singleton_lease)
+catalog_manager.swap_listeners += [card_embeds.clear, page_embeds.clear]
+reveal_sessions = SessionStore("reveal", ttl=3600, max_sessions=20000, repo=repo)
+# Slash commands and button clicks share one budget per user.
+interaction_limiter = UserLimiter("interactions", rate=2, burst=8)
+
+for component in (reveal_sessions, card_embeds, page_embeds, interaction_limiter, singleton_lease):
+    metrics.stats_sources[component.name] = component.stats
+
+def select_booster_packs(count, booster="default"):
+    return catalog_manager.card_pool.draw_packs(count, booster)
+
+async def booster_choices(ctx):
+    return [booster for booster in catalog_manager.card_pool.boosters if ctx.value.lower() in booster.lower()][:25]
+
+def get_next_pack_in(user_doc):
+    return format_countdown(user_doc['last_refill_at'] + pack_interval)
 
 @bot.slash_command(name="begin", description="Use this to begin playing")
+@metrics.timed("command_begin")
+@interaction_limiter.guard()
 async def begin(ctx):
     user_id = str(ctx.author.id)
 
-    user_doc = users_col.find_one({"user_id": user_id})
+    user_doc = await repo.refresh_packs(user_id, pack_interval, max_packs)
 
     if not user_doc:
         user_doc = {
             "user_id": user_id,
             "packs_left": 5,
             "packs_opened": 0,
-            "collected_cards": {} 
+            "last_refill_at": datetime.now(timezone.utc),
+            "set_progress": {},
+            "distinct_cards": 0
         }
 
-        users_col.insert_one(user_doc)
+        await repo.create_user(user_doc)
 
         embed = discord.Embed(
             title="🎉 **Welcome to the game!**",
@@ -98,29 +97,63 @@ async def begin(ctx):
     else:
         embed = discord.Embed(
             title="🚨 **You've already begun!**",
-            description=f"\u200b\nUse `/open` to start opening booster packs.\n\n{ctx.author.mention}",
+            description=f"\u200b\nYou have **{user_doc['packs_left']} booster packs** left.\nUse `/open` to start opening booster packs.\n\n{ctx.author.mention}",
             color=0xe74c3c
         )
+        if user_doc['packs_left'] < max_packs:
+            embed.set_footer(text=f"Next pack in {get_next_pack_in(user_doc)}")
         embed.set_thumbnail(url=ctx.author.display_avatar.url)
 
         await ctx.respond(embeds=[embed])
 
 @bot.slash_command(name="sets", description="Use this to show your card progress for sets")
+@metrics.timed("command_sets")
+@interaction_limiter.guard()
 async def sets(ctx):
-    await handle_sets(ctx, bot, all_sets, users_col)
+    await handle_sets(ctx, bot, catalog_manager.catalog, repo)
 
 @bot.slash_command(name="cards", description="Use this to show all your cards")
-async def cards(ctx):
-    await handle_cards(ctx, bot, all_cards, all_sets, users_col, bot.user.display_avatar.url)
+@metrics.timed("command_cards")
+@interaction_limiter.guard()
+async def cards(ctx, sort: discord.Option(str, "How to sort your cards", choices=list(owned_card_sorts), default="name")):
+    await handle_cards(ctx, bot, catalog_manager.catalog, repo, bot.user.display_avatar.url, sort)
+
+@bot.slash_command(name="leaderboard", description="Use this to see the top collectors and rarest pulls")
+@metrics.timed("command_leaderboard")
+@interaction_limiter.guard()
+async def leaderboard(ctx, board: discord.Option(str, "Which leaderboard to show", choices=list(leaderboards) + ["rarest"], default="collectors")):
+    await handle_leaderboard(ctx, bot, catalog_manager.catalog, repo, board)
 
 @bot.slash_command(name="open", description="Use this to open a booster pack")
-async def open(ctx):
-    booster_pack = select_booster_pack()
+@metrics.timed("command_open")
+@interaction_limiter.guard()
+async def open(
+    ctx,
+    count: discord.Option(int, "How many packs to open at once", min_value=1, max_value=max_packs, default=1),
+    booster: discord.Option(str, "Which booster to open", autocomplete=booster_choices, default="default")
+):
+    if not catalog_manager.card_pool.boosters:
+        embed = discord.Embed(
+            title="🚨 **No cards yet!**",
+            description=f"\u200b\nThere are no cards to pull yet.\nTry `/open` again once the catalog has loaded.\n\n{ctx.author.mention}",
+            color=0xe74c3c
+        )
+        embed.set_thumbnail(url=ctx.author.display_avatar.url)
+        return await ctx.respond(embeds=[embed])
+
+    if booster not in catalog_manager.card_pool.boosters:
+        embed = discord.Embed(
+            title="🚨 **Unknown booster!**",
+            description=f"\u200b\nThere is no booster called **{booster}**.\nUse `/open` to open a regular booster pack.\n\n{ctx.author.mention}",
+            color=0xe74c3c
+        )
+        embed.set_thumbnail(url=ctx.author.display_avatar.url)
+        return await ctx.respond(embeds=[embed])
 
     user_id = str(ctx.author.id)
     interaction_guid = str(uuid.uuid4())
 
-    user_doc = users_col.find_one({"user_id": user_id})
+    user_doc = await repo.refresh_packs(user_id, pack_interval, max_packs)
 
     if not user_doc:
         embed = discord.Embed(
@@ -131,18 +164,31 @@ async def open(ctx):
         embed.set_thumbnail(url=ctx.author.display_avatar.url)
         return await ctx.respond(embeds=[embed])
 
-    packs_left = user_doc.get("packs_left", 0)
+    committed_doc = None
+    if user_doc['packs_left'] > 0:
+        # Asking for more packs than are banked opens all that are left.
+        booster_packs = select_booster_packs(min(count, user_doc['packs_left']), booster)
+        booster_pack = [card for pack in booster_packs for card in pack]
+        owned_fields = {card.id: catalog_manager.catalog.get_owned_fields(card) for card in booster_pack}
+        committed_doc = await repo.commit_packs(user_id, booster_packs, owned_fields)
 
-    if packs_left <= 0:
+    if not committed_doc:
         embed = discord.Embed(
             title="🚨 **You're out of packs!**",
-            description=f"\u200b\nYou can gain one pack to open every 4 hours.\nTry again later!\n\n{ctx.author.mention}\n\u200b",
+            description=f"\u200b\nYou can gain one pack to open every 4 hours.\nYour next pack arrives in **{get_next_pack_in(user_doc)}**.\n\n{ctx.author.mention}\n\u200b",
             color=0xe74c3c
         )
         embed.set_footer(text="Note: You can only hold up to 5 packs at a time.")
         embed.set_thumbnail(url=ctx.author.display_avatar.url)
         return await ctx.respond(embeds=[embed])
 
+    pack_state = build_pack_state(user_id, booster_packs, booster, committed_doc, pack_interval)
+    await reveal_sessions.set(interaction_guid, pack_state)
+
+    if len(booster_packs) > 1:
+        embed, view = render_summary_page(catalog_manager.catalog, catalog_manager.card_pool, interaction_guid, pack_state, 0, ctx.author, pika)
+        return await ctx.respond(embeds=[embed], view=view)
+
     embed = discord.Embed(
         title="🎉 **You opened a booster pack!** 🎉",
         description=f"\u200b\nPress 'Next Card' to reveal your first card.\n\n{ctx.author.mention}",
@@ -150,224 +196,95 @@ async def open(ctx):
     )
     embed.set_thumbnail(url=ctx.author.display_avatar.url)
 
-    next_button = Button(style=discord.ButtonStyle.secondary, label="Next Card", custom_id=f"next_card_{interaction_guid}")
-    prev_button = Button(style=discord.ButtonStyle.secondary, label="Previous Card", custom_id=f"prev_card_{interaction_guid}", disabled=True)
-    finish_button = Button(style=discord.ButtonStyle.success, label="Finish", custom_id=f"finish_{interaction_guid}", disabled=True)
-
-    view = View(timeout=None)
-    view.add_item(prev_button)
-    view.add_item(next_button)
-
     await ctx.respond(
         embeds=[embed],
-        view=view
-    )
-
-
-    user_states[interaction_guid] = {
-        "cards": booster_pack,
-        "current_index": 0
-    }
-
-    for card in booster_pack:
-        card_id = card['id'] 
-        set_id = card['set']
-
-        if set_id not in user_doc['collected_cards']:
-            user_doc['collected_cards'][set_id] = {}
-
-        if card_id in user_doc['collected_cards'][set_id]:
-            user_doc['collected_cards'][set_id][card_id] += 1
-        else:
-            user_doc['collected_cards'][set_id][card_id] = 1
-
-    users_col.update_one(
-        {"user_id": user_id},
-        {"$inc": {"packs_left": -1, "packs_opened": 1}},
+        view=RevealView(interaction_guid, -1, len(booster_pack))
     )
 
-    users_col.update_one(
-        {"user_id": user_id},
-        {"$set": {"collected_cards": user_doc['collected_cards']}}
-    )
-
-    async def button_callback(interaction):
-        user_id = str(interaction.user.id)
-
-        custom_id = interaction.custom_id
-        interaction_guid = custom_id.split('_')[-1]
-
-        user_state = user_states.get(interaction_guid, None)
-
-        if not user_state:
-            return await interaction.response.send_message("Sorry, this pull is no longer available.", ephemeral=True)
-
-        cards = user_state["cards"]
-        current_index = user_state["current_index"]
-
-        if interaction.custom_id.startswith("next_card"):
-            if current_index < len(cards):
-                card = cards[current_index]
-                
-                card_id = card.get('id', 'Unknown Id')
-                name = card.get('name', 'Unknown Card')
-                rarity = card.get('rarity', 'Unknown Rarity')
-                rarity_percent = round(rarity_probabilities[rarity] * 100, 2)
-                card_image = card.get('image', 'https://via.placeholder.com/150')
-                
-                set_id = card.get('set', None)
-                set_image = 'https://via.placeholder.com/150'
-                if set_id:
-                    set = next((s for s in all_sets if s['id'] == set_id), None)
-                    if set:
-                        set_name = set.get('name', 'Unknown Set')
-                        set_image = set.get('image', 'https://via.placeholder.com/150')
-                
-                card_count = get_card_collection_count(user_id, card_id, set_id)-1
-                if card_count > 0:
-                    collection_info = f"**Times Collected:** {card_count+1}"
-                else:
-                    collection_info = f"**New Card!** {pika}{pika}{pika}"
-
-                embed = discord.Embed(
-                    title=f"Card {current_index+1}/{len(cards)}",
-                    description=f"**Name:** {name}\n**Set:** {set_name}\n**Rarity:** {rarity} ({rarity_percent}%)\n\n{collection_info}\n\n{ctx.author.mention}",
-                    color=0x3498db
-                )
-                embed.set_image(url=card_image)
-                embed.set_thumbnail(url=set_image)
-                embed.set_author(name=ctx.author.display_name, icon_url=ctx.author.display_avatar.url)
-                
-                prev_button.disabled = (current_index == 0)
-                next_button.disabled = (current_index == len(cards) - 1)
-                finish_button.disabled = (current_index != len(cards) - 1)
-
-                view.clear_items()
-                view.add_item(prev_button)
-                if current_index == len(cards) - 1:
-                    view.add_item(finish_button)  
-                else:
-                    view.add_item(next_button)  
-                await interaction.response.edit_message(
-                    embeds=[embed],
-                    view=view
-                )
-
-                user_states[interaction_guid]["current_index"] = current_index + 1
-
-        # Handle "Previous Card"
-        elif interaction.custom_id.startswith("prev_card"):
-            if current_index > 0:
-                user_states[interaction_guid]["current_index"] = current_index - 1
-                card = cards[current_index - 1]
-                
-                card_id = card.get('id', 'Unknown Id')
-                name = card.get('name', 'Unknown Card')
-                rarity = card.get('rarity', 'Unknown Rarity')
-                rarity_percent = round(rarity_probabilities[rarity] * 100, 2)
-                card_image = card.get('image', 'https://via.placeholder.com/150')
-                
-                set_id = card.get('set', None)
-                set_image = 'https://via.placeholder.com/150'
-                if set_id:
-                    set = next((s for s in all_sets if s['id'] == set_id), None)
-                    if set:
-                        set_name = set.get('name', 'Unknown Set')
-                        set_image = set.get('image', 'https://via.placeholder.com/150')
-                
-                card_count = get_card_collection_count(user_id, card_id, set_id)-1
-                if card_count > 0:
-                    collection_info = f"**Times Collected:** {card_count+1}"
-                else:
-                    collection_info = f"**New Card!** {pika}{pika}{pika}"
-
-                embed = discord.Embed(
-                    title=f"Card {current_index}/{len(cards)}",
-                    description=f"**Name:** {name}\n**Set:** {set_name}\n**Rarity:** {rarity} ({rarity_percent}%)\n\n{collection_info}\n\n{ctx.author.mention}",
-                    color=0x3498db
-                )
-                embed.set_image(url=card_image)
-                embed.set_thumbnail(url=set_image)
-                embed.set_author(name=ctx.author.display_name, icon_url=ctx.author.display_avatar.url)
-
-                prev_button.disabled = (current_index == 1)
-                next_button.disabled = (current_index == len(cards))
-
-                view.clear_items()
-                view.add_item(prev_button)
-                if current_index == len(cards):
-                    view.add_item(finish_button)
-                else:
-                    view.add_item(next_button) 
-                await interaction.response.edit_message(
-                    embeds=[embed],
-                    view=view
-                )
-
-        elif interaction.custom_id.startswith("finish"):
-            packs_left = user_doc['packs_left']-1
-            if packs_left > 0:
-                pack_info = f"You have **{packs_left} booster packs** left.\nYou can open another pack with `/open`."
-            else:
-                pack_info = f"You have **{packs_left} booster packs** left.\nPlease wait **4 hours**.\nThen, you can open another pack with `/open`." 
-
-            final_embed = discord.Embed(
-                title="🎉 **All cards pulled!** 🎉",
-                description=f"{pack_info}\n\n{ctx.author.mention}",
-                color=0x3498db
-            )
-            final_embed.set_thumbnail(url=ctx.author.display_avatar.url)
-
-            view.clear_items()
-            view.add_item(prev_button)
-            if current_index == len(cards) - 1:
-                view.add_item(finish_button)
-            elif current_index != len(cards):
-                view.add_item(next_button) 
-
-            await interaction.response.edit_message(
-                embeds=[final_embed],
-                view=view
-            )
-
-    next_button.callback = button_callback
-    prev_button.callback = button_callback
-    finish_button.callback = button_callback
-
-async def hourly_packs_loop():
-    while True:
-        for user_doc in users_col.find({"packs_left": {"$lt": 5}}):
-            users_col.update_one(
-                {"user_id": user_doc["user_id"]},
-                {"$inc": {"packs_left": 1}}
-            )
-        embed = discord.Embed(
-            title="🎁 **Packs Distributed!** 🎁",
-            description=f"\u200b\nOne additional pack has been added for users with less than 5 packs. The next distribution will happen in approximately 4 hours.\n\u200b",
-            color=0x3498db 
-        )
-        embed.set_thumbnail(url=bot.user.display_avatar.url)
-        channel = bot.get_channel(1335401186429501525)
-        await channel.send(embed=embed)
-        await asyncio.sleep(14400)
+@bot.listen("on_interaction")
+async def route_components(interaction):
+    if interaction.type != discord.InteractionType.component:
+        return
+
+    prefix, *args = interaction.custom_id.split(":")
+    catalog = catalog_manager.catalog
+
+    if prefix == "reveal":
+        handler = lambda: handle_reveal_button(interaction, args, catalog, catalog_manager.card_pool, reveal_sessions, pika)
+    elif prefix == "summary":
+        handler = lambda: handle_summary_button(interaction, args, catalog, catalog_manager.card_pool, reveal_sessions, pika)
+    elif prefix == "cards":
+        handler = lambda: handle_cards_button(interaction, args, catalog, repo)
+    elif prefix == "sets":
+        handler = lambda: handle_sets_button(interaction, args, catalog, repo)
+    else:
+        return
+
+    async with metrics.track(f"button_{prefix}"):
+        await interaction_limiter.run(interaction, interaction.custom_id, handler)
+
+@tasks.loop(minutes=5)
+async def sweep_sessions():
+    reveal_sessions.sweep()
+    print(f"Sessions [{reveal_sessions.name}]: {reveal_sessions.stats()}")
+    for cache in (card_embeds, page_embeds):
+        print(f"Cache [{cache.name}]: {cache.stats()}")
+    print(f"Limiter [{interaction_limiter.name}]: {interaction_limiter.stats()}")
+    if metrics.enabled and not metrics.metrics_port:
+        print(f"Latency: {metrics.summary()}")
+
+@tasks.loop(minutes=5)
+async def refresh_catalog():
+    # tasks.loop stops for good on errors it doesn't retry itself, so a Mongo blip is
+    # logged and the next tick tries again.
+    async with metrics.track("task_refresh_catalog"):
+        try:
+            await catalog_manager.refresh()
+        except PyMongoError as error:
+            print(f"Catalog refresh failed: {error!r}")
+
+@tasks.loop(seconds=30)
+async def renew_lease():
+    await singleton_lease.renew()
+
+@tasks.loop(minutes=30)
+async def refresh_card_stats():
+    if not singleton_lease.held:
+        return
+
+    async with metrics.track("task_refresh_card_stats"):
+        try:
+            await repo.refresh_card_stats()
+        except PyMongoError as error:
+            print(f"Card stats refresh failed: {error!r}")
 
 @bot.event
 async def on_ready():
     print(f'Logged in as {bot.user}')
     
-    global all_sets
-    global all_cards
     global pika
 
-    all_sets = list(sets_col.find()) 
-    print(f"Loaded {len(all_sets)} sets into memory.")
-    
-    all_cards = list(cards_col.find()) 
-    print(f"Loaded {len(all_cards)} cards into memory.")
+    # on_ready fires again on every gateway reconnect; the catalog and the
+    # background tasks must only be set up once.
+    await repo.ensure_indexes()
+    await catalog_manager.load()
+    await metrics.start()
 
-    guild = bot.get_guild(1094098329937379422)
+    # The emoji's guild may be on a shard another process runs.
+    guild = bot.get_guild(1094098329937379422) or await bot.fetch_guild(1094098329937379422)
     pika = discord.utils.get(guild.emojis, name="TCGPika")
 
-    await hourly_packs_loop()
-
-bot.run(discord_token)
+    if not sweep_sessions.is_running():
+        sweep_sessions.start()
+    # The lease is settled first so the first catalog refresh knows whether this
+    # process reconciles owned_cards.
+    if not renew_lease.is_running():
+        await singleton_lease.renew()
+        renew_lease.start()
+    if not refresh_catalog.is_running():
+        refresh_catalog.start()
+    if not refresh_card_stats.is_running():
+        refresh_card_stats.start()
+
+if __name__ == "__main__":
+    bot.run(discord_token)
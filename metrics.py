@@ -0,0 +1,196 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from pymongo import monitoring
+
+enabled = os.getenv("METRICS_ENABLED", "").lower() in ("1", "true", "yes")
+metrics_port = int(os.getenv("METRICS_PORT", "0"))
+
+latency_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+count_buckets = (0, 1, 2, 4, 8, 16, 32, 64)
+
+# Mongo calls made while serving an interaction are charged to it through this.
+current_interaction = contextvars.ContextVar("current_interaction", default=None)
+
+class Histogram:
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.series = {}
+        # Mongo timings are observed from executor threads, alongside the loop.
+        self.lock = threading.Lock()
+
+    def observe(self, label, value):
+        with self.lock:
+            series = self.series.get(label)
+            if series is None:
+                series = self.series[label] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def snapshot(self):
+        with self.lock:
+            return {label: (list(counts), total) for label, (counts, total) in self.series.items()}
+
+    def quantile(self, label, q):
+        # Upper bound of the bucket the quantile falls in
+        counts = self.snapshot()[label][0]
+        rank = q * sum(counts)
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label, (counts, total) in sorted(self.snapshot().items()):
+            seen = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                seen += count
+                lines.append(f'{self.name}_bucket{{name="{label}",le="{bound}"}} {seen}')
+            lines.append(f'{self.name}_sum{{name="{label}"}} {total}')
+            lines.append(f'{self.name}_count{{name="{label}"}} {seen}')
+        return lines
+
+class InteractionStats:
+    __slots__ = ("mongo_calls", "mongo_time")
+
+    def __init__(self):
+        self.mongo_calls = 0
+        self.mongo_time = 0.0
+
+interaction_latency = Histogram("tcg_interaction_seconds", "Time to handle a command or button click.", latency_buckets)
+interaction_mongo_calls = Histogram("tcg_interaction_mongo_calls", "Mongo commands issued per interaction.", count_buckets)
+interaction_mongo_time = Histogram("tcg_interaction_mongo_seconds", "Time spent in Mongo per interaction.", latency_buckets)
+mongo_latency = Histogram("tcg_mongo_command_seconds", "Mongo command round-trip time.", latency_buckets)
+loop_lag = Histogram("tcg_event_loop_lag_seconds", "How late the event loop ran a scheduled wakeup.", latency_buckets)
+histograms = [interaction_latency, interaction_mongo_calls, interaction_mongo_time, mongo_latency, loop_lag]
+
+# Guards InteractionStats, which the commands of one interaction may update from
+# several executor threads at once
+stats_lock = threading.Lock()
+
+# Components exporting a stats() dict, e.g. session stores, caches and limiters
+stats_sources = {}
+
+class MongoListener(monitoring.CommandListener):
+    # Called on the executor thread running the command, which carries a copy of
+    # the caller's context, so the interaction it belongs to can be charged.
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.record(event)
+
+    def failed(self, event):
+        self.record(event)
+
+    def record(self, event):
+        seconds = event.duration_micros / 1e6
+        mongo_latency.observe(event.command_name, seconds)
+        stats = current_interaction.get()
+        if stats is not None:
+            with stats_lock:
+                stats.mongo_calls += 1
+                stats.mongo_time += seconds
+
+def event_listeners():
+    return [MongoListener()] if enabled else []
+
+class measure:
+    __slots__ = ("name", "stats", "token", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    async def __aenter__(self):
+        self.stats = InteractionStats()
+        self.token = current_interaction.set(self.stats)
+        self.started = time.perf_counter()
+
+    async def __aexit__(self, *exc):
+        interaction_latency.observe(self.name, time.perf_counter() - self.started)
+        interaction_mongo_calls.observe(self.name, self.stats.mongo_calls)
+        interaction_mongo_time.observe(self.name, self.stats.mongo_time)
+        current_interaction.reset(self.token)
+
+class skip_measure:
+    async def __aenter__(self):
+        pass
+
+    async def __aexit__(self, *exc):
+        pass
+
+def track(name):
+    return measure(name) if enabled else skip_measure()
+
+def timed(name=None):
+    # With metrics off the function is returned untouched, so it costs nothing.
+    def decorator(func):
+        if not enabled:
+            return func
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            async with measure(name or func.__name__):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+async def watch_loop_lag(interval=0.5):
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        loop_lag.observe("main", max(loop.time() - expected, 0))
+
+def render():
+    lines = []
+    for histogram in histograms:
+        lines += histogram.render()
+    lines += ["# TYPE tcg_component_stat gauge"]
+    for source, stats in sorted(stats_sources.items()):
+        for stat, value in stats().items():
+            lines.append(f'tcg_component_stat{{component="{source}",stat="{stat}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+def summary():
+    return {
+        label: {
+            "count": sum(counts),
+            "mean_ms": round(total / sum(counts) * 1000, 1),
+            "p50_ms": interaction_latency.quantile(label, 0.5) * 1000,
+            "p99_ms": interaction_latency.quantile(label, 0.99) * 1000
+        }
+        for label, (counts, total) in sorted(interaction_latency.snapshot().items())
+    }
+
+async def serve_metrics(reader, writer):
+    try:
+        await reader.readuntil(b"\r\n\r\n")
+        body = render().encode()
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\nContent-Length: " + str(len(body)).encode() + b"\r\nConnection: close\r\n\r\n" + body)
+        await writer.drain()
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+background_tasks = []
+
+async def start():
+    if not enabled or background_tasks:
+        return
+
+    background_tasks.append(asyncio.create_task(watch_loop_lag()))
+    # Without a port, metrics are only dumped to the log by the caller.
+    if metrics_port:
+        await asyncio.start_server(serve_metrics, "127.0.0.1", metrics_port)
+        print(f"Serving metrics on 127.0.0.1:{metrics_port}")
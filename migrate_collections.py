@@ -0,0 +1,78 @@
+# Moves every user's nested collected_cards map into the owned_cards collection.
+# Stop the bot first; the migration is idempotent and resumes where it left off.
+from dotenv import load_dotenv
+import os
+import sys
+from pymongo import UpdateOne
+from catalog import Card, build_catalog
+from database import connect
+
+load_dotenv()
+
+batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+db = connect(os.getenv("MONGO_URI"))[os.getenv("MONGO_DB", "pokemon_tcg")]
+users_col = db['users']
+owned_cards_col = db['owned_cards']
+
+catalog, _ = build_catalog(
+    [Card.from_doc(doc) for doc in db['cards'].find({}, {"_id": 0, "id": 1, "name": 1, "rarity": 1, "set": 1})],
+    list(db['sets'].find({}, {"_id": 0, "id": 1, "name": 1, "image": 1})),
+    list(db['pack_definitions'].find({"enabled": {"$ne": False}}, {"_id": 0}))
+)
+
+def migrate_batch(user_docs):
+    owned_requests = []
+    user_requests = []
+
+    for user_doc in user_docs:
+        set_progress = {}
+        for set_id, cards in user_doc['collected_cards'].items():
+            set_progress[set_id] = {"distinct": sum(1 for count in cards.values() if count > 0), "copies": sum(cards.values())}
+            for card_id, count in cards.items():
+                card = catalog.cards_by_id.get(card_id) or Card.from_doc({"id": card_id, "set": set_id})
+                # $max keeps a rerun over a half-migrated batch from double counting.
+                owned_requests.append(UpdateOne(
+                    {"user_id": user_doc['user_id'], "card_id": card_id},
+                    {"$max": {"count": count}, "$setOnInsert": catalog.get_owned_fields(card)},
+                    upsert=True
+                ))
+
+        user_requests.append(UpdateOne(
+            {"_id": user_doc['_id']},
+            {
+                "$set": {"set_progress": set_progress, "distinct_cards": sum(progress['distinct'] for progress in set_progress.values())},
+                "$unset": {"collected_cards": "", "owned_cards_synced": "", "set_progress_synced": ""}
+            }
+        ))
+
+    if owned_requests:
+        owned_cards_col.bulk_write(owned_requests, ordered=False)
+    users_col.bulk_write(user_requests, ordered=False)
+
+migrated_users = 0
+batch = []
+for user_doc in users_col.find({"collected_cards": {"$exists": True}}, {"user_id": 1, "collected_cards": 1}).batch_size(batch_size):
+    batch.append(user_doc)
+    if len(batch) >= batch_size:
+        migrate_batch(batch)
+        migrated_users += len(batch)
+        print(f"Migrated {migrated_users} users.")
+        batch = []
+
+if batch:
+    migrate_batch(batch)
+    migrated_users += len(batch)
+
+print(f"Migration complete: {migrated_users} users moved to owned_cards.")
+
+# Users migrated before the leaderboard existed get their distinct_cards counter
+# summed from set_progress.
+backfilled = users_col.update_many(
+    {"distinct_cards": {"$exists": False}},
+    [{"$set": {"distinct_cards": {"$sum": {"$map": {
+        "input": {"$objectToArray": {"$ifNull": ["$set_progress", {}]}},
+        "in": {"$ifNull": ["$$this.v.distinct", 0]}
+    }}}}}]
+)
+print(f"Backfilled distinct_cards for {backfilled.modified_count} users.")
@@ -0,0 +1,163 @@
+from array import array
+import random
+
+rarity_probabilities = {
+    "Common": 0.70,
+    "Uncommon": 0.20,
+    "Rare": 0.08,
+    "Rare Holo": 0.015,
+    "Rare Secret": 0.005
+}
+
+# Used when the pack_definitions collection is empty
+default_booster = {"id": "default", "slots": [rarity_probabilities] * 5}
+
+class AliasTable:
+    __slots__ = ("outcomes", "probabilities", "aliases")
+
+    def __init__(self, weights):
+        # Vose's alias method: one uniform index plus one coin flip per sample.
+        self.outcomes = list(weights)
+        total = sum(weights.values())
+        size = len(self.outcomes)
+        scaled = [weights[outcome] * size / total for outcome in self.outcomes]
+
+        self.probabilities = [1.0] * size
+        self.aliases = list(range(size))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probabilities[less] = scaled[less]
+            self.aliases[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+
+    def sample(self, rng):
+        i = int(rng.random() * len(self.outcomes))
+        if rng.random() >= self.probabilities[i]:
+            i = self.aliases[i]
+        return self.outcomes[i]
+
+def compile_slot(weights, buckets):
+    # A rarity with no cards hands its weight to the next more common rarity that
+    # has cards, or failing that the rarest one that does, so the slot keeps its shape.
+    by_weight = sorted(((w, rarity) for rarity, w in weights.items() if w > 0), reverse=True)
+    stocked = [rarity for _, rarity in by_weight if buckets.get(rarity)]
+    if not stocked:
+        return None
+
+    compiled = {}
+    for position, (w, rarity) in enumerate(by_weight):
+        if not buckets.get(rarity):
+            more_common = [r for _, r in reversed(by_weight[:position]) if buckets.get(r)]
+            rarity = more_common[0] if more_common else stocked[0]
+        compiled[rarity] = compiled.get(rarity, 0) + w
+
+    return compiled
+
+class Booster:
+    __slots__ = ("id", "slots", "buckets", "rarity_odds")
+
+    def __init__(self, id, slots, buckets, rarity_odds):
+        self.id = id
+        self.slots = slots
+        self.buckets = buckets
+        self.rarity_odds = rarity_odds
+
+def definition_error(definition):
+    # Pack definitions are edited by hand in Mongo, so one malformed document is
+    # reported and skipped rather than failing the whole catalog load.
+    if not definition.get('id'):
+        return "no id"
+    slots = definition.get('slots')
+    if not isinstance(slots, list) or not slots:
+        return "slots must be a non-empty list"
+    for weights in slots:
+        if not isinstance(weights, dict) or not all(
+            isinstance(rarity, str) and isinstance(w, (int, float)) and not isinstance(w, bool)
+            for rarity, w in weights.items()
+        ):
+            return "each slot must map rarity names to numeric weights"
+    return None
+
+def compile_booster(catalog, definition):
+    if definition.get('set'):
+        set_handles = set(catalog.cards_by_set.get(definition['set'], ()))
+        buckets = {}
+        for rarity, handles in catalog.cards_by_rarity.items():
+            in_set = array('I', (handle for handle in handles if handle in set_handles))
+            if in_set:
+                buckets[rarity] = in_set
+    else:
+        buckets = catalog.cards_by_rarity
+
+    slots = [compile_slot(weights, buckets) for weights in definition['slots']]
+    if not slots or None in slots:
+        return None
+
+    # The odds shown for a rarity are its average chance per slot in this booster,
+    # after any weight has moved off empty rarities.
+    rarity_odds = {}
+    for weights in slots:
+        total = sum(weights.values())
+        for rarity, w in weights.items():
+            rarity_odds[rarity] = rarity_odds.get(rarity, 0) + w / total / len(slots)
+
+    return Booster(definition['id'], [AliasTable(weights) for weights in slots], buckets, rarity_odds)
+
+class CardPool:
+    def __init__(self, catalog, pack_definitions=None, seed=None):
+        self.cards = catalog.cards
+        self.rng = random.Random(seed)
+
+        self.boosters = {}
+        for definition in pack_definitions or []:
+            error = definition_error(definition)
+            if error:
+                print(f"Skipping booster {definition.get('id')}: {error}.")
+                continue
+            booster = compile_booster(catalog, definition)
+            if booster:
+                self.boosters[definition['id']] = booster
+            else:
+                print(f"Skipping booster {definition['id']}: no cards to fill its slots.")
+
+        # /open without a booster falls back on the built-in pack, unless the catalog
+        # has no cards at all.
+        if "default" not in self.boosters:
+            booster = compile_booster(catalog, default_booster)
+            if booster:
+                self.boosters["default"] = booster
+
+        # Rarer rarities rank higher: by their odds in the default pack, or else in
+        # whichever booster makes them most likely. Rarities no booster can draw rank
+        # above all others.
+        rarity_odds = {}
+        for booster in self.boosters.values():
+            for rarity, odds in booster.rarity_odds.items():
+                rarity_odds[rarity] = max(rarity_odds.get(rarity, 0), odds)
+        if "default" in self.boosters:
+            rarity_odds.update(self.boosters["default"].rarity_odds)
+        rarities = set(catalog.cards_by_rarity) | set(rarity_odds)
+        rarities.discard(None)
+        self.rarity_ranks = {rarity: rank for rank, rarity in enumerate(sorted(rarities, key=lambda r: (-rarity_odds.get(r, 0), r)))}
+
+    def rarity_percent(self, rarity, booster="default"):
+        booster = self.boosters.get(booster) or self.boosters.get("default")
+        return round(booster.rarity_odds.get(rarity, 0) * 100, 2) if booster else 0
+
+    def draw_packs(self, count, booster="default", rng=None):
+        rng = rng or self.rng
+        booster = self.boosters[booster]
+        packs = []
+
+        for _ in range(count):
+            pack = []
+            for table in booster.slots:
+                bucket = booster.buckets[table.sample(rng)]
+                pack.append(self.cards[bucket[int(rng.random() * len(bucket))]])
+            packs.append(pack)
+
+        return packs
@@ -0,0 +1,134 @@
+from datetime import datetime, timezone
+import discord
+from discord.ui import Button, View
+from catalog import placeholder_image
+from embed_cache import LRUCache
+
+# Everything in a card embed except the owner's counts and mention, by booster and
+# card id since the odds shown depend on the booster the card was pulled from
+card_embeds = LRUCache("card_embeds", 5000)
+
+class RevealView(View):
+    def __init__(self, pack_id, shown, total):
+        # Views are never stored: every click is routed by its custom_id, which
+        # carries the pack id and the card index the button leads to.
+        super().__init__(timeout=None, store=False)
+
+        self.add_item(Button(style=discord.ButtonStyle.secondary, label="Previous Card", custom_id=f"reveal:show:{pack_id}:{shown - 1}", disabled=shown <= 0))
+        if shown < total - 1:
+            self.add_item(Button(style=discord.ButtonStyle.secondary, label="Next Card", custom_id=f"reveal:show:{pack_id}:{shown + 1}"))
+        elif shown == total - 1:
+            self.add_item(Button(style=discord.ButtonStyle.success, label="Finish", custom_id=f"reveal:finish:{pack_id}"))
+
+def format_countdown(next_pack_at):
+    remaining = next_pack_at - datetime.now(timezone.utc)
+    minutes = max(int(remaining.total_seconds() // 60), 0)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def get_times_collected(booster_pack, user_doc):
+    # user_doc carries the counts after the commit, so a card pulled more than once
+    # counts up to its final total across its copies in the pack.
+    owned_counts = user_doc['owned_counts']
+    seen = {}
+    times_collected = []
+
+    for card in booster_pack:
+        card_id = card.id
+        pulled = sum(1 for c in booster_pack if c.id == card_id)
+        seen[card_id] = seen.get(card_id, 0) + 1
+        times_collected.append(owned_counts[card_id] - pulled + seen[card_id])
+
+    return times_collected
+
+def build_pack_state(owner_id, booster_packs, booster, user_doc, pack_interval):
+    booster_pack = [card for pack in booster_packs for card in pack]
+    return {
+        "owner_id": owner_id,
+        "card_ids": [card.id for card in booster_pack],
+        "times_collected": get_times_collected(booster_pack, user_doc),
+        "pack_size": len(booster_packs[0]),
+        "booster": booster,
+        "packs_left": user_doc['packs_left'],
+        "next_pack_at": user_doc['last_refill_at'] + pack_interval
+    }
+
+def get_card_embed_base(catalog, card_pool, card, booster):
+    card_embed = card_embeds.get((booster, card.id))
+    if card_embed:
+        return card_embed
+
+    rarity = card.rarity or 'Unknown Rarity'
+    # Rarities the pack definitions don't weight are shown without odds.
+    rarity_percent = card_pool.rarity_percent(card.rarity, booster)
+    rarity_info = f"{rarity} ({rarity_percent}%)" if rarity_percent else rarity
+    set_name = catalog.set_names.get(card.set, 'Unknown Set')
+    set_image = catalog.set_images.get(card.set, placeholder_image)
+
+    card_embed = {
+        "description": f"**Name:** {card.name}\n**Set:** {set_name}\n**Rarity:** {rarity_info}\n\n",
+        "color": 0x3498db,
+        "image": {"url": card.image},
+        "thumbnail": {"url": set_image}
+    }
+    card_embeds.put((booster, card.id), card_embed)
+    return card_embed
+
+def create_card_embed(catalog, card_pool, card, booster, index, total, times_collected, user, pika):
+    card_embed = get_card_embed_base(catalog, card_pool, card, booster)
+
+    if times_collected > 1:
+        collection_info = f"**Times Collected:** {times_collected}"
+    else:
+        collection_info = f"**New Card!** {pika}{pika}{pika}"
+
+    embed = discord.Embed.from_dict(dict(
+        card_embed,
+        title=f"Card {index + 1}/{total}",
+        description=f"{card_embed['description']}{collection_info}\n\n{user.mention}"
+    ))
+    embed.set_author(name=user.display_name, icon_url=user.display_avatar.url)
+
+    return embed
+
+def get_pack_info(pack_state):
+    packs_left = pack_state['packs_left']
+    if packs_left > 0:
+        return f"You have **{packs_left} booster packs** left.\nYou can open another pack with `/open`."
+    return f"You have **{packs_left} booster packs** left.\nYour next pack arrives in **{format_countdown(pack_state['next_pack_at'])}**.\nThen, you can open another pack with `/open`."
+
+def create_finish_embed(pack_state, user):
+    pack_info = get_pack_info(pack_state)
+
+    embed = discord.Embed(
+        title="🎉 **All cards pulled!** 🎉",
+        description=f"{pack_info}\n\n{user.mention}",
+        color=0x3498db
+    )
+    embed.set_thumbnail(url=user.display_avatar.url)
+
+    return embed
+
+async def handle_reveal_button(interaction, args, catalog, card_pool, reveal_sessions, pika):
+    action, pack_id = args[0], args[1]
+
+    pack_state = await reveal_sessions.get(pack_id)
+
+    if not pack_state:
+        return await interaction.response.send_message("Sorry, this pull is no longer available.", ephemeral=True)
+
+    if str(interaction.user.id) != pack_state['owner_id']:
+        return await interaction.response.send_message("This is not your booster pack!", ephemeral=True)
+
+    card_ids = pack_state['card_ids']
+    total = len(card_ids)
+
+    if action == "finish":
+        embed = create_finish_embed(pack_state, interaction.user)
+        view = RevealView(pack_id, total, total)
+    else:
+        index = min(max(int(args[2]), 0), total - 1)
+        card = catalog.cards_by_id[card_ids[index]]
+        embed = create_card_embed(catalog, card_pool, card, pack_state.get('booster', 'default'), index, total, pack_state['times_collected'][index], interaction.user, pika)
+        view = RevealView(pack_id, index, total)
+
+    await interaction.response.edit_message(embeds=[embed], view=view)
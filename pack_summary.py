@@ -0,0 +1,104 @@
+import discord
+from discord.ui import Button, View
+from pack_reveal import get_pack_info
+
+# Pulls at or below these odds are called out as rare in the summary
+rare_percent = 5
+highlights_shown = 15
+
+class SummaryView(View):
+    def __init__(self, pack_id, page, total_pages):
+        # Page 0 is the summary of every pack; pages 1..N list one pack each. Summary
+        # has its own action so its custom_id never matches Previous on page 1.
+        super().__init__(timeout=None, store=False)
+
+        self.add_item(Button(style=discord.ButtonStyle.secondary, label="Previous", custom_id=f"summary:show:{pack_id}:{page - 1}", disabled=page <= 0))
+        self.add_item(Button(style=discord.ButtonStyle.secondary, label="Next", custom_id=f"summary:show:{pack_id}:{page + 1}", disabled=page >= total_pages - 1))
+        self.add_item(Button(style=discord.ButtonStyle.primary, label="Summary", custom_id=f"summary:home:{pack_id}", disabled=page == 0))
+
+def is_rare_pull(card_pool, card, booster):
+    return card_pool.rarity_percent(card.rarity, booster) <= rare_percent
+
+def card_line(catalog, card_pool, card, booster, times_collected, pika):
+    markers = []
+    if times_collected == 1:
+        markers.append(f"**New!** {pika}")
+    if is_rare_pull(card_pool, card, booster):
+        markers.append("✨")
+    set_name = catalog.set_names.get(card.set, 'Unknown Set')
+    return f"**{card.name}** ({card.rarity or 'Unknown Rarity'}, {set_name}) {' '.join(markers)}".rstrip()
+
+def create_summary_embed(catalog, card_pool, pack_state, user, pika):
+    cards = [catalog.cards_by_id[card_id] for card_id in pack_state['card_ids']]
+    times_collected = pack_state['times_collected']
+    pack_count = len(cards) // pack_state['pack_size']
+    booster = pack_state.get('booster', 'default')
+
+    new_count = sum(1 for times in times_collected if times == 1)
+    rare_count = sum(1 for card in cards if is_rare_pull(card_pool, card, booster))
+
+    # New and rare pulls first, rarest at the top
+    highlights = sorted(
+        ((card, times) for card, times in zip(cards, times_collected) if times == 1 or is_rare_pull(card_pool, card, booster)),
+        key=lambda pull: card_pool.rarity_percent(pull[0].rarity, booster)
+    )
+    lines = [card_line(catalog, card_pool, card, booster, times, pika) for card, times in highlights[:highlights_shown]]
+    if len(highlights) > highlights_shown:
+        lines.append(f"...and {len(highlights) - highlights_shown} more")
+
+    embed = discord.Embed(
+        title=f"🎉 **You opened {pack_count} booster packs!** 🎉",
+        description=f"\u200b\n{len(cards)} cards pulled: **{new_count} new**, **{rare_count} rare**.\n\n" + "\n".join(lines) + f"\n\n{get_pack_info(pack_state)}\n\n{user.mention}",
+        color=0x3498db
+    )
+    embed.set_footer(text="Use Next to see each pack.")
+    embed.set_author(name=user.display_name, icon_url=user.display_avatar.url)
+
+    return embed
+
+def create_pack_page_embed(catalog, card_pool, pack_state, page, user, pika):
+    pack_size = pack_state['pack_size']
+    pack_count = len(pack_state['card_ids']) // pack_size
+    start = (page - 1) * pack_size
+    booster = pack_state.get('booster', 'default')
+
+    lines = [
+        card_line(catalog, card_pool, catalog.cards_by_id[card_id], booster, times, pika)
+        for card_id, times in zip(pack_state['card_ids'][start:start + pack_size], pack_state['times_collected'][start:start + pack_size])
+    ]
+
+    embed = discord.Embed(
+        title=f"Pack {page}/{pack_count}",
+        description="\n".join(lines) + f"\n\n{user.mention}",
+        color=0x3498db
+    )
+    embed.set_author(name=user.display_name, icon_url=user.display_avatar.url)
+
+    return embed
+
+def render_summary_page(catalog, card_pool, pack_id, pack_state, page, user, pika):
+    total_pages = len(pack_state['card_ids']) // pack_state['pack_size'] + 1
+    page = min(max(page, 0), total_pages - 1)
+
+    if page == 0:
+        embed = create_summary_embed(catalog, card_pool, pack_state, user, pika)
+    else:
+        embed = create_pack_page_embed(catalog, card_pool, pack_state, page, user, pika)
+
+    return embed, SummaryView(pack_id, page, total_pages)
+
+async def handle_summary_button(interaction, args, catalog, card_pool, reveal_sessions, pika):
+    action, pack_id = args[0], args[1]
+    page = 0 if action == "home" else int(args[2])
+
+    pack_state = await reveal_sessions.get(pack_id)
+
+    if not pack_state:
+        return await interaction.response.send_message("Sorry, this pull is no longer available.", ephemeral=True)
+
+    if str(interaction.user.id) != pack_state['owner_id']:
+        return await interaction.response.send_message("These are not your booster packs!", ephemeral=True)
+
+    embed, view = render_summary_page(catalog, card_pool, pack_id, pack_state, page, interaction.user, pika)
+
+    await interaction.response.edit_message(embeds=[embed], view=view)
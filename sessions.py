@@ -0,0 +1,78 @@
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+class Session:
+    __slots__ = ("data", "expires_at")
+
+    def __init__(self, data, expires_at):
+        self.data = data
+        self.expires_at = expires_at
+
+class SessionStore:
+    def __init__(self, name, ttl=900, max_sessions=10000, repo=None):
+        self.name = name
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.repo = repo
+        self.sessions = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    async def get(self, key):
+        session = self.sessions.get(key)
+
+        if session and session.expires_at <= time.monotonic():
+            del self.sessions[key]
+            self.expirations += 1
+            session = None
+
+        if session:
+            self.sessions.move_to_end(key)
+            self.hits += 1
+            return session.data
+
+        # Sessions evicted from memory or lost on restart are reloaded from Mongo.
+        if self.repo:
+            data = await self.repo.load_session(self.name, key)
+            if data is not None:
+                self.hits += 1
+                self.put(key, data)
+                return data
+
+        self.misses += 1
+        return None
+
+    async def set(self, key, data):
+        self.put(key, data)
+        if self.repo:
+            expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+            await self.repo.save_session(self.name, key, data, expires_at)
+
+    def put(self, key, data):
+        self.sessions[key] = Session(data, time.monotonic() + self.ttl)
+        self.sessions.move_to_end(key)
+
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+            self.evictions += 1
+
+    def sweep(self):
+        now = time.monotonic()
+        expired = [key for key, session in self.sessions.items() if session.expires_at <= now]
+        for key in expired:
+            del self.sessions[key]
+        self.expirations += len(expired)
+        return len(expired)
+
+    def stats(self):
+        return {
+            "live": len(self.sessions),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
@@ -2,67 +2,100 @@
 import discord
 from discord.ui import Button, View
 
-# A global dictionary to store current page for each user
-page_states = {}
+# Number of sets listed on the summary page
+summary_size = 25
+
+# View holding the pagination buttons; the owner and page are encoded in each custom_id
+class SetsView(View):
+    def __init__(self, owner_id, current_page, total_pages):
+        super().__init__(timeout=None, store=False)
+
+        self.add_item(Button(style=discord.ButtonStyle.secondary, label="Previous", custom_id=f"sets:prev:{owner_id}:{current_page}", disabled=current_page <= 0))
+        self.add_item(Button(style=discord.ButtonStyle.secondary, label="Next", custom_id=f"sets:next:{owner_id}:{current_page}", disabled=current_page >= total_pages - 1))
+        self.add_item(Button(style=discord.ButtonStyle.primary, label="Summary", custom_id=f"sets:summary:{owner_id}:{current_page}"))
 
 # Function to update the embed with the current set information
-async def update_embed(ctx, user_doc, sorted_sets, current_page):
-    collected_cards = user_doc['collected_cards']
-    set_data = sorted_sets[current_page]
-    set_id = set_data['id']
+async def update_embed(user, set_progress, set_data):
     set_name = set_data['name']
     set_image = set_data['image']
     total_cards_in_set = set_data.get('total_cards', 0)
-    cards_collected_in_set = sum(collected_cards.get(set_id, {}).values())
+    cards_collected_in_set = set_progress.get('distinct', 0)
+    copies_in_set = set_progress.get('copies', 0)
 
-    set_info = f"**{set_name}:**\n{cards_collected_in_set}/{total_cards_in_set} card{'s' if cards_collected_in_set != 1 else ''}\n"
+    set_info = f"**{set_name}:**\n{cards_collected_in_set}/{total_cards_in_set} card{'s' if cards_collected_in_set != 1 else ''}\n{copies_in_set} cop{'ies' if copies_in_set != 1 else 'y'} collected\n"
 
     embed = discord.Embed(
         title="Your Set Progress",
-        description=f"{set_info}\n{ctx.author.mention}",
+        description=f"{set_info}\n{user.mention}",
         color=0x3498db
     )
     embed.set_thumbnail(url=set_image)
-    embed.set_author(name=ctx.author.display_name, icon_url=ctx.author.display_avatar.url)
+    embed.set_author(name=user.display_name, icon_url=user.display_avatar.url)
 
     return embed
 
-# Function to create buttons for pagination
-def create_pagination_buttons():
-    prev_button = Button(style=discord.ButtonStyle.secondary, label="Previous", custom_id="prev_set")
-    next_button = Button(style=discord.ButtonStyle.secondary, label="Next", custom_id="next_set")
-    return prev_button, next_button
+# Function to build the summary embed listing sets by completion
+async def summary_embed(user, catalog, set_progress):
+    completion = []
+    for set_id, progress in set_progress.items():
+        set_data = catalog.sets_by_id.get(set_id)
+        if set_data:
+            total_cards_in_set = set_data.get('total_cards', 0) or 1
+            completion.append((progress.get('distinct', 0) / total_cards_in_set, progress.get('distinct', 0), set_data))
+
+    completion.sort(key=lambda c: c[0], reverse=True)
+
+    lines = [
+        f"**{set_data['name']}:** {distinct}/{set_data.get('total_cards', 0)} ({round(percent * 100, 1)}%)"
+        for percent, distinct, set_data in completion[:summary_size]
+    ]
+
+    embed = discord.Embed(
+        title="Your Set Progress Summary",
+        description="\n".join(lines) + f"\n\n{user.mention}",
+        color=0x3498db
+    )
+    embed.set_author(name=user.display_name, icon_url=user.display_avatar.url)
+
+    return embed
 
 # Callback function to handle pagination button clicks
-async def button_callback(interaction, ctx, user_doc, sorted_sets, view):
-    user_id = str(interaction.user.id)
-    
-    # Retrieve current page from global page state
-    current_page = page_states.get(user_id, 0)
+async def handle_sets_button(interaction, args, catalog, repo):
+    action, owner_id, current_page = args[0], args[1], int(args[2])
 
-    if interaction.user.id != ctx.author.id:
+    if str(interaction.user.id) != owner_id:
         return await interaction.response.send_message("This is not your set progress!", ephemeral=True)
 
-    if interaction.custom_id == "prev_set" and current_page > 0:
+    sorted_sets = catalog.sorted_sets
+
+    if action == "summary":
+        user_doc = await repo.get_user(owner_id, {"set_progress": 1})
+        embed = await summary_embed(interaction.user, catalog, user_doc.get('set_progress', {}))
+        return await interaction.response.edit_message(embed=embed, view=SetsView(owner_id, current_page, len(sorted_sets)))
+
+    if action == "prev" and current_page > 0:
         current_page -= 1
-    elif interaction.custom_id == "next_set" and current_page < len(sorted_sets) - 1:
+    elif action == "next" and current_page < len(sorted_sets) - 1:
         current_page += 1
 
-    # Update the page state for the user
-    page_states[user_id] = current_page
+    # Only the counters of the set being shown are read
+    set_data = sorted_sets[current_page]
+    user_doc = await repo.get_user(owner_id, {f"set_progress.{set_data['id']}": 1})
+    set_progress = user_doc.get('set_progress', {}).get(set_data['id'], {})
 
     # Generate the new embed with the updated page
-    embed = await update_embed(ctx, user_doc, sorted_sets, current_page)
+    embed = await update_embed(interaction.user, set_progress, set_data)
 
     # Update the message with the new embed
-    await interaction.response.edit_message(embed=embed, view=view)
+    await interaction.response.edit_message(embed=embed, view=SetsView(owner_id, current_page, len(sorted_sets)))
 
 # Main function to handle sets command and pagination
-async def handle_sets(ctx, bot, all_sets, users_col):
+async def handle_sets(ctx, bot, catalog, repo):
     user_id = str(ctx.author.id)
-    user_doc = users_col.find_one({"user_id": user_id})
+    sorted_sets = catalog.sorted_sets
+    user_doc = await repo.get_user(user_id, {"packs_opened": 1, f"set_progress.{sorted_sets[0]['id']}": 1})
 
-    if not user_doc or not user_doc.get('collected_cards'):
+    if not user_doc or not user_doc.get('packs_opened'):
         embed = discord.Embed(
             title="🚨 **No Cards Collected Yet!**",
             description=f"\u200b\nYou haven't collected any cards yet.\nOpen some booster packs first!\n\nUse `/open` to open a pack.\n\n{ctx.author.mention}",
@@ -71,23 +104,8 @@ async def handle_sets(ctx, bot, all_sets, users_col):
         embed.set_thumbnail(url=ctx.author.display_avatar.url)
         return await ctx.respond(embeds=[embed])
 
-    collected_cards = user_doc['collected_cards']
-    sorted_sets = sorted(all_sets, key=lambda s: s['name'])
-    
-    # Set initial page state for the user
-    page_states[user_id] = 0
-
-    # Create buttons
-    prev_button, next_button = create_pagination_buttons()
-
-    # Create a view and add buttons
-    view = View(timeout=None)
-    view.add_item(prev_button)
-    view.add_item(next_button)
-
-    prev_button.callback = lambda interaction: button_callback(interaction, ctx, user_doc, sorted_sets, view)
-    next_button.callback = lambda interaction: button_callback(interaction, ctx, user_doc, sorted_sets, view)
+    set_progress = user_doc.get('set_progress', {}).get(sorted_sets[0]['id'], {})
 
     # Send initial embed
-    embed = await update_embed(ctx, user_doc, sorted_sets, page_states[user_id])
-    await ctx.respond(embed=embed, view=view)
+    embed = await update_embed(ctx.author, set_progress, sorted_sets[0])
+    await ctx.respond(embed=embed, view=SetsView(user_id, 0, len(sorted_sets)))
@@ -0,0 +1,63 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+import uuid
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+from catalog import Card, build_catalog
+from database import Repository
+
+test_mongo_uri = os.getenv("TEST_MONGO_URI", "mongodb://localhost:27017")
+
+rarities = ["Common", "Common", "Common", "Uncommon", "Uncommon", "Rare", "Rare Holo", "Rare Secret"]
+
+def make_catalog(card_count=24, set_count=3, pack_definitions=None):
+    cards = [
+        Card.from_doc({"id": f"set{i % set_count}-{i}", "name": f"Card {i}", "rarity": rarities[i % len(rarities)], "set": f"set{i % set_count}"})
+        for i in range(card_count)
+    ]
+    sets = [{"id": f"set{i}", "name": f"Set {i}"} for i in range(set_count)]
+    return build_catalog(cards, sets, pack_definitions)
+
+def new_user(user_id, packs_left=5):
+    return {
+        "user_id": user_id,
+        "packs_left": packs_left,
+        "packs_opened": 0,
+        "last_refill_at": datetime.now(timezone.utc),
+        "set_progress": {},
+        "distinct_cards": 0
+    }
+
+@pytest.fixture
+def small_catalog():
+    # Few enough cards that concurrent opens keep pulling the same ones
+    return make_catalog(card_count=12)
+
+@pytest.fixture(scope="session")
+def mongo_client():
+    # The listener is attached whatever METRICS_ENABLED says, so tests can count the
+    # commands charged to metrics.current_interaction.
+    client = MongoClient(test_mongo_uri, tz_aware=True, serverSelectionTimeoutMS=2000, event_listeners=[metrics.MongoListener()])
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        client.close()
+        pytest.skip(f"no MongoDB server at {test_mongo_uri} (set TEST_MONGO_URI)")
+    yield client
+    client.close()
+
+@pytest.fixture
+def repo(mongo_client):
+    db = mongo_client[f"pokemon_tcg_test_{uuid.uuid4().hex[:8]}"]
+    repo = Repository(db)
+    asyncio.run(repo.ensure_indexes())
+    yield repo
+    repo.executor.shutdown()
+    mongo_client.drop_database(db.name)
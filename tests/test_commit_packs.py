@@ -0,0 +1,69 @@
+import asyncio
+import random
+from collections import Counter
+from conftest import new_user
+
+def assert_collection_consistent(repo, user_id, opened):
+    user_doc = repo.users_col.find_one({"user_id": user_id})
+    owned = {doc['card_id']: doc for doc in repo.owned_cards_col.find({"user_id": user_id})}
+
+    pulled = Counter(card.id for pack in opened for card in pack)
+    assert {card_id: doc['count'] for card_id, doc in owned.items()} == pulled
+    assert user_doc['packs_opened'] == len(opened)
+    assert user_doc['distinct_cards'] == len(owned)
+    assert not user_doc.get('pending_commits')
+
+    for set_id, progress in user_doc['set_progress'].items():
+        in_set = [doc for doc in owned.values() if doc['set'] == set_id]
+        assert progress['distinct'] == len(in_set)
+        assert progress['copies'] == sum(doc['count'] for doc in in_set)
+
+def test_concurrent_opens_lose_no_cards_or_packs(repo, small_catalog):
+    # The opens race on the same owned_cards upserts and set_progress counters.
+    catalog, card_pool = small_catalog
+    rng = random.Random(1)
+    packs_left = 7
+
+    async def run():
+        await repo.create_user(new_user("1", packs_left))
+        batches = [card_pool.draw_packs(rng.randint(1, 3), rng=rng) for _ in range(30)]
+        owned_fields = {card.id: catalog.get_owned_fields(card) for card in catalog.cards}
+        results = await asyncio.gather(*[repo.commit_packs("1", batch, owned_fields) for batch in batches])
+        return [pack for batch, result in zip(batches, results) if result for pack in batch]
+
+    opened = asyncio.run(run())
+
+    assert 0 < len(opened) <= packs_left
+    assert repo.users_col.find_one({"user_id": "1"})['packs_left'] == packs_left - len(opened)
+    assert_collection_consistent(repo, "1", opened)
+
+def test_interrupted_commit_is_replayed_once(repo, small_catalog):
+    catalog, card_pool = small_catalog
+    rng = random.Random(2)
+    owned_fields = {card.id: catalog.get_owned_fields(card) for card in catalog.cards}
+
+    async def run():
+        await repo.create_user(new_user("1", 5))
+        first = card_pool.draw_packs(2, rng=rng)
+        await repo.commit_packs("1", first, owned_fields)
+
+        # Charge a pack but stop before its cards are written, as a crash would.
+        second = card_pool.draw_packs(1, rng=rng)
+        apply_commit = repo.apply_commit
+        async def crash(user_id, commit):
+            repo.apply_commit = apply_commit
+            raise ConnectionError("process died")
+        repo.apply_commit = crash
+        try:
+            await repo.commit_packs("1", second, owned_fields)
+        except ConnectionError:
+            pass
+        assert repo.users_col.find_one({"user_id": "1"})['pending_commits']
+
+        # Two processes may replay the same journal entry at once.
+        pending = repo.users_col.find_one({"user_id": "1"})['pending_commits']
+        await asyncio.gather(repo.replay_pending_commits("1", pending), repo.replay_pending_commits("1", pending))
+        return first + second
+
+    opened = asyncio.run(run())
+    assert_collection_consistent(repo, "1", opened)
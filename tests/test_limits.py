@@ -0,0 +1,140 @@
+import asyncio
+import random
+import discord
+from fakes import FakeContext, FakeInteraction, FakeMessage, FakeUser
+from limits import UserLimiter
+
+def component(user_id, custom_id):
+    message = FakeMessage()
+    return FakeInteraction(FakeUser(user_id), message, discord.InteractionType.component, custom_id), message
+
+def assert_cleaned_up(limiter):
+    assert limiter.locks == {}
+    assert limiter.pending == {}
+    assert limiter.in_flight == set()
+
+def test_duplicate_in_flight_requests_are_coalesced():
+    limiter = UserLimiter("test", rate=1, burst=5)
+    release = asyncio.Event()
+    runs = []
+
+    async def handler():
+        runs.append(1)
+        await release.wait()
+
+    async def run():
+        clicks = [component(1, "reveal:show:pack:1") for _ in range(10)]
+        first = asyncio.create_task(limiter.run(clicks[0][0], "reveal:show:pack:1", handler))
+        await asyncio.sleep(0)
+        await asyncio.gather(*[limiter.run(interaction, "reveal:show:pack:1", handler) for interaction, _ in clicks[1:]])
+
+        # A repeated command gets told to wait instead of a silent defer.
+        @limiter.guard("reveal:show:pack:1")
+        async def command(ctx):
+            await handler()
+        ctx = FakeContext(FakeUser(1))
+        await command(ctx)
+        release.set()
+        await first
+        return clicks, ctx
+
+    clicks, ctx = asyncio.run(run())
+
+    assert len(runs) == 1
+    assert limiter.coalesced == 10
+    assert all(message.deferred for _, message in clicks[1:])
+    assert "Still working" in ctx.message.content
+    assert_cleaned_up(limiter)
+
+def test_requests_past_the_burst_are_rejected():
+    limiter = UserLimiter("test", rate=0.001, burst=5)
+
+    async def handler():
+        pass
+
+    async def run():
+        messages = []
+        for i in range(8):
+            interaction, message = component(1, f"cards:page:{i}")
+            await limiter.run(interaction, interaction.custom_id, handler)
+            messages.append(message)
+        # Other users keep their own buckets.
+        interaction, other = component(2, "cards:page:0")
+        await limiter.run(interaction, interaction.custom_id, handler)
+        return messages, other
+
+    messages, other = asyncio.run(run())
+
+    assert limiter.allowed == 6
+    assert limiter.rejected == 3
+    assert all(message.content is None for message in messages[:5])
+    assert all("going too fast" in message.content for message in messages[5:])
+    assert other.content is None
+    assert_cleaned_up(limiter)
+
+def test_bursts_past_the_queue_are_shed_and_the_rest_run_one_at_a_time():
+    limiter = UserLimiter("test", rate=100, burst=100, max_waiting=2)
+    release = asyncio.Event()
+    running = []
+    overlapped = []
+
+    async def handler():
+        running.append(1)
+        overlapped.append(len(running) > 1)
+        await release.wait()
+        await asyncio.sleep(0)
+        running.pop()
+
+    async def run():
+        clicks = [component(1, f"sets:page:{i}") for i in range(10)]
+        tasks = [asyncio.create_task(limiter.run(interaction, interaction.custom_id, handler)) for interaction, _ in clicks]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(*tasks)
+        return clicks
+
+    clicks = asyncio.run(run())
+
+    # One runs and two wait; with three pending every later click is shed.
+    assert limiter.allowed == 3
+    assert limiter.shed == 7
+    assert all("going too fast" in message.content for _, message in clicks[3:])
+    assert overlapped == [False] * 3
+    assert_cleaned_up(limiter)
+
+def test_many_concurrent_interactions_leave_no_state_behind():
+    limiter = UserLimiter("test", rate=50, burst=5, max_waiting=2)
+    rng = random.Random(1)
+    running = {}
+    overlapped = []
+
+    async def handler(user_id):
+        running[user_id] = running.get(user_id, 0) + 1
+        overlapped.append(running[user_id] > 1)
+        for _ in range(rng.randint(1, 5)):
+            await asyncio.sleep(0)
+        if user_id % 7 == 0:
+            running[user_id] -= 1
+            raise RuntimeError("handler failed")
+        running[user_id] -= 1
+
+    async def interact(user_id):
+        # Yielding rather than sleeping keeps the interleaving the same on every run.
+        for _ in range(rng.randint(0, 20)):
+            await asyncio.sleep(0)
+        custom_id = rng.choice(["reveal:show:pack:0", "reveal:show:pack:1", "cards:page:1", "sets:page:1"])
+        interaction, _ = component(user_id, custom_id)
+        try:
+            await limiter.run(interaction, custom_id, lambda: handler(user_id))
+        except RuntimeError:
+            pass
+
+    async def run():
+        await asyncio.gather(*[interact(user_id) for user_id in range(50) for _ in range(20)])
+
+    asyncio.run(run())
+
+    assert limiter.allowed + limiter.rejected + limiter.coalesced + limiter.shed == 1000
+    assert limiter.rejected and limiter.coalesced and limiter.shed
+    assert not any(overlapped)
+    assert_cleaned_up(limiter)
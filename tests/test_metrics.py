@@ -0,0 +1,22 @@
+import threading
+import metrics
+
+def test_observe_from_many_threads_keeps_every_count():
+    histogram = metrics.Histogram("test_seconds", "Test.", metrics.latency_buckets)
+    threads = 8
+    per_thread = 5000
+
+    def observe(thread):
+        for i in range(per_thread):
+            histogram.observe(f"label{i % 50}", 0.001 * thread)
+
+    workers = [threading.Thread(target=observe, args=(thread,)) for thread in range(threads)]
+    for worker in workers:
+        worker.start()
+    # Rendering alongside the writers must not trip over labels being added.
+    while any(worker.is_alive() for worker in workers):
+        histogram.render()
+    for worker in workers:
+        worker.join()
+
+    assert sum(sum(counts) for counts, _ in histogram.snapshot().values()) == threads * per_thread
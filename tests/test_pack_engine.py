@@ -0,0 +1,18 @@
+from conftest import make_catalog
+
+def test_malformed_boosters_are_skipped(capsys):
+    pack_definitions = [
+        {"id": "good", "slots": [{"Common": 1}, {"Rare": 3, "Rare Holo": 1.5}]},
+        {"slots": [{"Common": 1}]},
+        {"id": "no_slots"},
+        {"id": "empty_slots", "slots": []},
+        {"id": "bad_weight", "slots": [{"Common": "1"}]},
+        {"id": "bad_slot", "slots": ["Common"]}
+    ]
+    catalog, card_pool = make_catalog(pack_definitions=pack_definitions)
+
+    assert set(card_pool.boosters) == {"good", "default"}
+    assert len(card_pool.draw_packs(1, "good")[0]) == 2
+    output = capsys.readouterr().out
+    for booster_id in ["None", "no_slots", "empty_slots", "bad_weight", "bad_slot"]:
+        assert f"Skipping booster {booster_id}:" in output
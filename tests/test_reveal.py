@@ -0,0 +1,100 @@
+import asyncio
+import random
+from datetime import timedelta
+import discord
+import pytest
+import metrics
+from conftest import new_user
+from database import Repository
+from fakes import FakeInteraction, FakeMessage, FakeUser
+from pack_reveal import RevealView, build_pack_state, handle_reveal_button
+from sessions import SessionStore
+
+@pytest.fixture
+def mock_repo():
+    mongomock = pytest.importorskip("mongomock")
+    repo = Repository(mongomock.MongoClient(tz_aware=True)['pokemon_tcg_test'])
+    yield repo
+    repo.executor.shutdown()
+
+async def click(user, message, label, catalog, card_pool, reveal_sessions):
+    button = next(item for item in message.buttons() if item.label == label)
+    interaction = FakeInteraction(user, message, discord.InteractionType.component, button.custom_id)
+    prefix, *args = button.custom_id.split(":")
+    await handle_reveal_button(interaction, args, catalog, card_pool, reveal_sessions, ":pika:")
+
+async def open_and_page_through(repo, small_catalog, count_calls, pack=None):
+    # Opens a pack the way /open does, then clicks through every card, back one and
+    # on to the finish, returning the calls count_calls saw for the open and each click
+    # and the pack state the reveal was built from.
+    catalog, card_pool = small_catalog
+    reveal_sessions = SessionStore("reveal", repo=repo)
+    user = FakeUser(1)
+    message = FakeMessage()
+
+    await repo.create_user(new_user("1"))
+    pack = pack or card_pool.draw_packs(1, rng=random.Random(3))[0]
+    owned_fields = {card.id: catalog.get_owned_fields(card) for card in pack}
+    pack_state = {}
+
+    async def commit():
+        committed = await repo.commit_packs("1", [pack], owned_fields)
+        pack_state.update(build_pack_state("1", [pack], "default", committed, timedelta(hours=4)))
+        await reveal_sessions.set("pack", pack_state)
+        message.view = RevealView("pack", -1, len(pack))
+
+    open_calls = await count_calls(commit())
+    labels = ["Next Card"] * len(pack) + ["Previous Card", "Next Card", "Finish"]
+    click_calls = [await count_calls(click(user, message, label, catalog, card_pool, reveal_sessions)) for label in labels]
+
+    assert "All cards pulled" in message.embeds[0].title
+    return open_calls, click_calls, pack_state
+
+def test_paging_through_a_reveal_sends_no_mongo_commands(repo, small_catalog):
+    async def mongo_commands(action):
+        stats = metrics.InteractionStats()
+        token = metrics.current_interaction.set(stats)
+        try:
+            await action
+        finally:
+            metrics.current_interaction.reset(token)
+        return stats.mongo_calls
+
+    open_calls, click_calls, _ = asyncio.run(open_and_page_through(repo, small_catalog, mongo_commands))
+
+    # The open itself is seen by the listener, so the zeros below are real.
+    assert open_calls > 0
+    assert click_calls == [0] * len(click_calls)
+
+def test_paging_through_a_reveal_makes_no_repository_calls(mock_repo, small_catalog):
+    # Runs without a server by counting Repository.run, which every Mongo call goes through.
+    async def repository_calls(action):
+        calls = []
+        run = mock_repo.run
+        async def counted(func, *args, **kwargs):
+            calls.append(func)
+            return await run(func, *args, **kwargs)
+        mock_repo.run = counted
+        try:
+            await action
+        finally:
+            del mock_repo.run
+        return len(calls)
+
+    open_calls, click_calls, _ = asyncio.run(open_and_page_through(mock_repo, small_catalog, repository_calls))
+
+    assert open_calls > 0
+    assert click_calls == [0] * len(click_calls)
+
+def test_a_card_pulled_twice_counts_up_across_its_copies(mock_repo, small_catalog):
+    async def run(action):
+        await action
+
+    catalog, _ = small_catalog
+    first, second = catalog.cards[:2]
+    pack = [first, second, first]
+
+    _, _, pack_state = asyncio.run(open_and_page_through(mock_repo, small_catalog, run, pack))
+
+    assert pack_state['card_ids'] == [first.id, second.id, first.id]
+    assert pack_state['times_collected'] == [1, 1, 2]